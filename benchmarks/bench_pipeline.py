@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+
+from config_manager import ConfigManager
+from data_processor import DataProcessor
+from quotation_plan import AREAS, collect_tasks
+from report_generator import ReportGenerator
+from template_index import build_template_index
+from synthetic_data import generate_dataset
+
+
+STAGES = ['template_index', 'read', 'total_cost', 'port_average', 'pod_mapping',
+          'load', 'partner_columns', 'best_prices', 'save']
+
+# Synthetic sizes as (partners, ports)
+SIZES = {
+    'small': (20, 500),
+    'medium': (100, 2000),
+    'large': (500, 5000)
+}
+
+
+class StageTimer:
+
+    def __init__(self):
+        self.stages = {stage: 0.0 for stage in STAGES}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+
+def area_files(config: dict, input_path: str, input_files: list, area: str) -> list:
+    # Files are split between areas by the same rule as the app, lock files and unprocessed areas included
+    return [os.path.join(input_path, input_file) for input_file, task_area in collect_tasks(config, input_files, AREAS)
+            if task_area == area]
+
+
+def sample_cases(config_path: str) -> list:
+    config, err = ConfigManager(config_path).load_config()
+    if err:
+        raise SystemExit(f"Cannot load {config_path}: {err}")
+
+    input_path = config['quotation']['input_path']
+    input_files = sorted(os.listdir(input_path))
+    cases = []
+
+    for area in AREAS:
+        input_area_files = area_files(config, input_path, input_files, area)
+        if not input_area_files:
+            continue
+
+        area_config = config['report'][area]
+        cases.append({
+            'case': f"sample-{area}",
+            'input_files': input_area_files,
+            'template_file': os.path.join(config['report']['template_path'], area_config['template_file']),
+            'area_config': area_config,
+            'input_sheet': config['quotation']['input_sheet']
+        })
+
+    return cases
+
+
+def synthetic_case(data_path: str, name: str, partners: int, ports: int) -> dict:
+    path = os.path.join(data_path, f"{partners}x{ports}")
+    dataset = generate_dataset(path, partners, ports)
+    # Synthetic partners are written for area1 with the default area suffixes of config.yaml
+    config = {'quotation': {'area1': {'suffix': '1', 'process': True}, 'area2': {'suffix': '2', 'process': True}}}
+    dataset['input_files'] = area_files(config, os.path.join(path, 'inputs'),
+                                        [os.path.basename(input_file) for input_file in dataset['input_files']], 'area1')
+    dataset['case'] = name
+    dataset['input_sheet'] = '2025'
+    return dataset
+
+
+def run_case(case: dict, engine: str, writer: str, work_path: str) -> dict:
+    config = {
+        'quotation': {'input_sheet': case['input_sheet'], 'engine': engine},
+        'report': {'writer': writer}
+    }
+    area_config = case['area_config']
+    timer = StageTimer()
+
+    report_file = os.path.join(work_path, os.path.basename(case['template_file']))
+    shutil.copyfile(case['template_file'], report_file)
+
+    with timer.stage('template_index'):
+        template_index = build_template_index(case['template_file'], area_config)
+
+    partners_data = {'20ft': [], '40ft': []}
+    for input_file in case['input_files']:
+        processor = DataProcessor(input_file, config)
+
+        with timer.stage('read'):
+            data = processor._get_quotation_data(case['input_sheet'], 0)
+        with timer.stage('total_cost'):
+            totals = processor._calculate_total_costs(data)
+        with timer.stage('port_average'):
+            min_sum20 = processor._calculate_average_port_cost(totals['20ft'])
+            min_sum40 = processor._calculate_average_port_cost(totals['40ft'])
+
+        with timer.stage('pod_mapping'):
+            for container_type, container_size, min_cost in [('20ft', '20feet', min_sum20),
+                                                             ('40ft', '40feet', min_sum40)]:
+                sheet = area_config[container_size]['report_sheet']
+                partners_data[container_type].append({
+                    'partner': processor.partner_name,
+                    'costs': processor._prepare_forwarder_data(min_cost, template_index.report_sheet(sheet).pod_names),
+                    'sheet': sheet
+                })
+
+    generator = ReportGenerator(config)
+    with timer.stage('load'):
+        workbook = generator._open_workbook(report_file)
+
+    for container_type, container_size in [('20ft', '20feet'), ('40ft', '40feet')]:
+        report_sheet = area_config[container_size]['report_sheet']
+        bestprices_sheet = area_config[container_size]['bestprices_sheet']
+        sheet_index = template_index.report_sheet(report_sheet)
+
+        with timer.stage('partner_columns'):
+            generator._fill_partner_columns(workbook[report_sheet], partners_data[container_type], sheet_index)
+
+        with timer.stage('best_prices'):
+            input_data = generator._build_cost_frame(partners_data[container_type], sheet_index).iloc[:, 2:]
+            best_prices_dict = generator._get_best_prices(input_data, area_config.get('top_k', 4))
+            generator._fill_bestprices_sheet(workbook[bestprices_sheet], best_prices_dict,
+                                             template_index.bestprices_sheet(bestprices_sheet))
+
+    with timer.stage('save'):
+        workbook.save(report_file)
+
+    ports = len(template_index.report_sheet(area_config['20feet']['report_sheet']).pods)
+    return {
+        'case': case['case'],
+        'partners': len(case['input_files']),
+        'ports': ports,
+        'stages': {stage: round(elapsed, 4) for stage, elapsed in timer.stages.items()},
+        'total': round(sum(timer.stages.values()), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every stage of the report pipeline on sample or synthetic data")
+    parser.add_argument('--sizes', nargs='+', default=['sample', 'small'],
+                        help=f"Cases to run: sample, {', '.join(SIZES)} or PARTNERSxPORTS (e.g. 50x1000)")
+    parser.add_argument('--config', default='config.yaml', help="Configuration used by the sample case")
+    parser.add_argument('--data-path', default=os.path.join(tempfile.gettempdir(), 'quotation_bench'),
+                        help="Directory for generated data, reused between runs")
+    parser.add_argument('--engine', default='auto', help="auto, calamine, xlrd or openpyxl")
+    parser.add_argument('--writer', default='patch', help="openpyxl or patch")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    cases = []
+    for size in args.sizes:
+        if size == 'sample':
+            cases.extend(sample_cases(args.config))
+            continue
+        partners, ports = SIZES[size] if size in SIZES else map(int, size.lower().split('x'))
+        cases.append(synthetic_case(args.data_path, size, partners, ports))
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_path:
+        for case in cases:
+            result = run_case(case, args.engine, args.writer, work_path)
+            results.append(result)
+            print(f"{result['case']:<16} {result['partners']:>5} partners {result['ports']:>6} ports "
+                  f"{result['total']:>9.2f} s", file=sys.stderr)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'engine': args.engine,
+        'writer': args.writer,
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+
+from data_processor import DataProcessor
+
+
+def legacy_average_port_cost(data: pd.DataFrame) -> pd.DataFrame:
+    data.dropna(subset=[data.columns[1]], inplace=True)
+    result_data = []
+
+    for port in data[data.columns[0]].unique():
+        port_data = data[data[data.columns[0]] == port]
+        if len(port_data) >= 3:
+            min_3_values = port_data.nsmallest(3, data.columns[1])
+            avg_cost = min_3_values[data.columns[1]].mean()
+        else:
+            avg_cost = port_data[data.columns[1]].mean()
+
+        result_data.append({
+            data.columns[0]: port,
+            data.columns[1]: round(avg_cost, 2)
+        })
+
+    return pd.DataFrame(result_data)
+
+
+def make_total_cost(rows: int, ports: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    port_names = np.array([f"PORT {i:05d}" for i in range(ports)], dtype=object)
+    cost = rng.uniform(100, 5000, rows).round(2)
+    cost[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'PORT': port_names[rng.integers(0, ports, rows)],
+        'TOTALCOST': cost
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and vectorized port cost averaging")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--ports', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_total_cost(args.rows, args.ports)
+    processor = DataProcessor('BENCHMARK1.xls', {})
+
+    legacy = legacy_average_port_cost(data.copy())
+    vectorized = processor._calculate_average_port_cost(data.copy())
+    pd.testing.assert_frame_equal(legacy, vectorized, check_dtype=False, check_exact=True)
+
+    legacy_time = min(timeit.repeat(lambda: legacy_average_port_cost(data.copy()), number=1, repeat=args.repeat))
+    vectorized_time = min(timeit.repeat(lambda: processor._calculate_average_port_cost(data.copy()),
+                                        number=1, repeat=args.repeat))
+
+    print(f"rows={args.rows} ports={args.ports}")
+    print(f"legacy:     {legacy_time * 1000:10.2f} ms")
+    print(f"vectorized: {vectorized_time * 1000:10.2f} ms")
+    print(f"speedup:    {legacy_time / vectorized_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+
+from data_processor import DataProcessor, QUOTATION_COLUMNS
+
+
+def legacy_quotation_data(input_file_path: str, sheet: str, engine=None):
+    df = pd.read_excel(input_file_path, sheet_name=sheet, skiprows=0, engine=engine)
+    return df.iloc[:, QUOTATION_COLUMNS]
+
+
+def measure(func, repeat: int):
+    best_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and column-pruned partner sheet reads")
+    parser.add_argument('--input-path', default='sample/inputs')
+    parser.add_argument('--sheet', default='2025')
+    parser.add_argument('--engine', default='auto', help="auto, calamine, xlrd or openpyxl")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    config = {'quotation': {'input_sheet': args.sheet, 'engine': args.engine}}
+    print(f"{'file':<20} {'legacy ms':>10} {'pruned ms':>10} {'legacy KiB':>11} {'pruned KiB':>11}")
+
+    for input_file in sorted(os.listdir(args.input_path)):
+        input_file_path = os.path.join(args.input_path, input_file)
+        processor = DataProcessor(input_file_path, config)
+        # Both reads use the same engine, so the difference is the column pruning alone
+        engine = processor._get_excel_engine()
+
+        legacy, legacy_time, legacy_peak = measure(
+            lambda: legacy_quotation_data(input_file_path, args.sheet, engine), args.repeat)
+        pruned, pruned_time, pruned_peak = measure(
+            lambda: processor._get_quotation_data(args.sheet, 0), args.repeat)
+
+        pd.testing.assert_frame_equal(legacy, pruned, check_names=False)
+
+        print(f"{input_file:<20} {legacy_time * 1000:>10.1f} {pruned_time * 1000:>10.1f} "
+              f"{legacy_peak / 1024:>11.0f} {pruned_peak / 1024:>11.0f}")
+
+        if engine == 'calamine':
+            # pandas never picks calamine by default, this row shows the gain of the engine itself
+            _, default_time, default_peak = measure(
+                lambda: legacy_quotation_data(input_file_path, args.sheet), args.repeat)
+            print(f"{'  default engine':<20} {default_time * 1000:>10.1f} {'':>10} {default_peak / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+
+import numpy as np
+import openpyxl as opxl
+
+
+# Column headers of a partner sheet, in the layout DataProcessor._get_quotation_data reads
+PARTNER_HEADER = ['PORT', 'CARRIER', "20'FT", "40'FT", "20'FT", "40'FT",
+                  'BAF', 'EBS', 'CIC', 'THC', 'DOC', '20FT', "40'FT/'HQ"]
+REPORT_HEADER = ['POL', 'Destination', 'POD']
+BESTPRICES_HEADER = ['REGION', 'COUNTRY', 'DESTINATION', 'LINE', 'FWD', 'OCF + LCC', 'ALL IN', 'PRIORITY']
+
+
+def port_names(ports: int) -> list:
+    return [f"PORT {i:05d}" for i in range(ports)]
+
+
+def area_config(area: str, top_k: int = 4) -> dict:
+    area_num = area.replace('area', '')
+    return {
+        'template_file': f"TEMPLATE_AREA_{area_num}.XLSX",
+        'top_k': top_k,
+        '20feet': {
+            'report_sheet': '운임견적(20피트)',
+            'bestprices_sheet': f"AREA {area_num} - 20FT"
+        },
+        '40feet': {
+            'report_sheet': '운임견적(40피트)',
+            'bestprices_sheet': f"AREA {area_num} - 40HC"
+        }
+    }
+
+
+def write_template(file: str, ports: int, area_config: dict) -> None:
+    workbook = opxl.Workbook(write_only=True)
+    pods = port_names(ports)
+    top_k = area_config.get('top_k', 4)
+
+    for container_size in ['20feet', '40feet']:
+        worksheet = workbook.create_sheet(area_config[container_size]['bestprices_sheet'])
+        worksheet.append([])
+        worksheet.append([None, 'SYNTHETIC TEMPLATE'])
+        worksheet.append([None, '※ Regulation of choice FWD', None, None, None, 'UNIT: USD/CONT'])
+        worksheet.append([])
+        worksheet.append(BESTPRICES_HEADER)
+        for pod in pods:
+            for priority in range(1, top_k + 1):
+                worksheet.append(['REGION', 'COUNTRY', pod, None, None, None, None, priority])
+
+        worksheet = workbook.create_sheet(area_config[container_size]['report_sheet'])
+        worksheet.append([])
+        worksheet.append([])
+        worksheet.append(['1) Ocean Freight '])
+        worksheet.append(REPORT_HEADER)
+        for idx, pod in enumerate(pods):
+            worksheet.append(['Ho Chi Minh' if idx == 0 else None, None, pod])
+
+    workbook.save(file)
+
+
+def write_partner(file: str, sheet: str, ports: int, rows_per_port: int, coverage: float, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    pods = np.array(port_names(ports), dtype=object)
+    quoted = pods[rng.random(ports) < coverage]
+    rows = np.repeat(quoted, rows_per_port)
+    rng.shuffle(rows)
+
+    freight = rng.uniform(100, 5000, (len(rows), 2)).round(2)
+    freight[rng.random(len(rows)) < 0.05, 0] = np.nan
+    surcharges = rng.uniform(0, 200, (len(rows), 5)).round(2)
+    lcc = rng.uniform(50, 400, (len(rows), 2)).round(2)
+
+    workbook = opxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet)
+    worksheet.append(PARTNER_HEADER)
+    for idx, port in enumerate(rows):
+        cost20, cost40 = (None if np.isnan(value) else float(value) for value in freight[idx])
+        worksheet.append([
+            port.lower() if idx % 7 == 0 else port, 'LINE',
+            cost20, cost40, 0.0, 0.0,
+            *surcharges[idx].tolist(),
+            *lcc[idx].tolist()
+        ])
+
+    workbook.save(file)
+
+
+def generate_dataset(path: str, partners: int, ports: int, area: str = 'area1', suffix: str = '1',
+                     sheet: str = '2025', rows_per_port: int = 2, coverage: float = 0.8,
+                     top_k: int = 4, seed: int = 0) -> dict:
+    input_path = os.path.join(path, 'inputs')
+    template_path = os.path.join(path, 'templates')
+    os.makedirs(input_path, exist_ok=True)
+    os.makedirs(template_path, exist_ok=True)
+
+    config = area_config(area, top_k)
+    template_file = os.path.join(template_path, config['template_file'])
+    if not os.path.exists(template_file):
+        write_template(template_file, ports, config)
+
+    input_files = []
+    for idx in range(partners):
+        input_file = os.path.join(input_path, f"P{idx:04d}{suffix}.xlsx")
+        if not os.path.exists(input_file):
+            write_partner(input_file, sheet, ports, rows_per_port, coverage, seed + idx)
+        input_files.append(input_file)
+
+    return {
+        'input_files': input_files,
+        'template_file': template_file,
+        'area_config': config
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic partner quotation files and a matching template")
+    parser.add_argument('path', help="Directory to write inputs/ and templates/ into")
+    parser.add_argument('--partners', type=int, default=10)
+    parser.add_argument('--ports', type=int, default=500)
+    parser.add_argument('--rows-per-port', type=int, default=2)
+    parser.add_argument('--coverage', type=float, default=0.8, help="Share of template ports quoted by each partner")
+    parser.add_argument('--top-k', type=int, default=4)
+    parser.add_argument('--sheet', default='2025')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.path, args.partners, args.ports, sheet=args.sheet,
+                               rows_per_port=args.rows_per_port, coverage=args.coverage,
+                               top_k=args.top_k, seed=args.seed)
+    print(f"{len(dataset['input_files'])} partner files, template {dataset['template_file']}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,11 +1,79 @@
 #!/usr/bin/env python3
 
-from quotation_app import QuotationApp
+import sys
+import argparse
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate quotation reports and best price lists")
+    parser.add_argument('command', nargs='?', choices=['run', 'plan', 'history', 'serve', 'whatif'], default='run',
+                        help="'plan' only validates the configuration and lists what a run would process, "
+                             "'history' prints the archived rates of a POD, "
+                             "'serve' starts the HTTP service, "
+                             "'whatif' re-ranks the best prices of the last reports for a partner scenario")
+    parser.add_argument('pod', nargs='?', help="POD to print the archived rates of (history only)")
+    parser.add_argument('--config', default='config.yaml', help="Path to the configuration file")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes used to parse partner files (0 = all CPUs)")
+    parser.add_argument('--pipeline', action='store_true', default=None,
+                        help="Build each area report in memory with a single workbook load and save")
+    parser.add_argument('--parallel-areas', action='store_true', default=None,
+                        help="Run every configured area as its own pipeline in a separate process")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-process new or changed partner files and update the existing reports")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and update the reports whenever partner files are added or changed")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="Seconds between two polls of the input folder in watch mode")
+    parser.add_argument('--profile', nargs='?', const='profiles', default=None, metavar='DIR',
+                        help="Profile the ingestion and report phases with cProfile and tracemalloc into DIR (default: profiles)")
+    parser.add_argument('--area', choices=['area1', 'area2'], default=None, help="Only show rates of / re-rank this area (history and whatif)")
+    parser.add_argument('--container', choices=['20ft', '40ft'], default=None, help="Only show rates of this container type (history only)")
+    parser.add_argument('--partner', default=None, help="Only show rates of this partner (history only)")
+    parser.add_argument('--period', nargs='+', default=None, metavar='SHEET', help="Only show rates of these quotation periods, named by input sheet (history only)")
+    parser.add_argument('--include', nargs='+', default=None, metavar='PARTNER', help="Only rank these partners (whatif only)")
+    parser.add_argument('--exclude', nargs='+', default=None, metavar='PARTNER', help="Leave these partners out of the ranking (whatif only)")
+    parser.add_argument('--adjust', nargs='+', default=None, metavar='PARTNER=+N[%]',
+                        help="Shift a partner's costs by an amount or a percentage, e.g. BLIS=+5%% TMVINA=-20 (whatif only)")
+    parser.add_argument('--scenario', default='WHATIF', help="Scenario name appended to the report name (whatif only)")
+    parser.add_argument('--tag', default=None, help="Report tag of the reports to re-rank, as given to batch runs (whatif only)")
+    parser.add_argument('--host', default=None, help="Address the service listens on (serve only)")
+    parser.add_argument('--port', type=int, default=None, help="Port the service listens on, 0 picks a free one (serve only)")
+    args = parser.parse_args()
+    if args.command == 'history' and not args.pod:
+        parser.error("the history command needs a POD")
+    return args
 
 
 def main():
+    args = parse_args()
+    if args.command == 'plan':
+        # Imported here so the plan command never loads pandas or openpyxl
+        from quotation_plan import run_plan
+        sys.exit(run_plan(args.config))
+    
+    if args.command == 'history':
+        from rate_archive import run_history
+        sys.exit(run_history(args.config, args.pod, args.area, args.container, args.partner, args.period))
+    
+    if args.command == 'whatif':
+        from what_if import Scenario, run_what_if
+        try:
+            scenario = Scenario(args.scenario, args.include, args.exclude, args.adjust)
+        except ValueError as e:
+            print(e)
+            sys.exit(2)
+        sys.exit(run_what_if(args.config, scenario, [args.area] if args.area else None, args.tag))
+    
+    if args.command == 'serve':
+        from quotation_service import run_service
+        sys.exit(run_service(args.config, args.host, args.port, args.workers))
+
+    from quotation_app import QuotationApp
     try:
-        app = QuotationApp()
+        app = QuotationApp(args.config, workers=args.workers, pipeline=args.pipeline,
+                           incremental=args.incremental, parallel_areas=args.parallel_areas,
+                           watch=args.watch, interval=args.interval, profile=args.profile)
         app.run()
     except KeyboardInterrupt:
         print("\n\nApplication interrupted by user.")
@@ -15,5 +83,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
-
+    main()
\ No newline at end of file
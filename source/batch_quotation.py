@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from config_manager import ConfigManager
+from quotation_app import QuotationApp
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate quotation reports for several configurations and input sheets in one process")
+    parser.add_argument('--config', nargs='+', default=['config.yaml'], help="Configuration files to run")
+    parser.add_argument('--input-sheet', nargs='+', default=None,
+                        help="Input sheets to run every configuration with (default: the sheet of each configuration)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Size of the worker pool shared by all runs (0 = all CPUs, 1 = no pool)")
+    parser.add_argument('--pipeline', action='store_true', default=None,
+                        help="Build each area report in memory with a single workbook load and save")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-process new or changed partner files and update the existing reports")
+    return parser.parse_args()
+
+
+def build_jobs(config_paths: list, input_sheets: list) -> list:
+    jobs = []
+    for config_path in config_paths:
+        config, err = ConfigManager(config_path).load_config()
+        if err:
+            raise ValueError(f"File configuration '{config_path}' cannot be loaded: {err}")
+
+        config_name = os.path.splitext(os.path.basename(config_path))[0]
+        for input_sheet in input_sheets or [config['quotation']['input_sheet']]:
+            report_tag = f"{config_name}_{input_sheet}"
+            jobs.append((config_path, str(input_sheet), report_tag, config['report']['output_path']))
+
+    # Runs writing to the same output path need distinct report names
+    seen = set()
+    for _, _, report_tag, output_path in jobs:
+        key = (os.path.abspath(output_path), report_tag.upper())
+        if key in seen:
+            raise ValueError(f"Report name '{report_tag}' is used twice in '{output_path}', rename one of the configuration files")
+        seen.add(key)
+
+    return jobs
+
+
+def resolve_workers(workers) -> int:
+    if workers is None:
+        return 1
+    if workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+
+def main():
+    args = parse_args()
+
+    try:
+        jobs = build_jobs(args.config, args.input_sheet)
+    except ValueError as e:
+        print(f"\n{e}")
+        sys.exit(1)
+
+    workers = resolve_workers(args.workers)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    template_cache = {}
+    failed_jobs = []
+
+    try:
+        for idx, (config_path, input_sheet, report_tag, _) in enumerate(jobs, 1):
+            print(f"\r\n[{idx}/{len(jobs)}] {config_path} - sheet {input_sheet}")
+            app = QuotationApp(config_path, workers=workers, pipeline=args.pipeline, incremental=args.incremental,
+                               parallel_areas=False, input_sheet=input_sheet, report_tag=report_tag,
+                               executor=executor, template_cache=template_cache)
+            try:
+                if not app.execute():
+                    failed_jobs.append(report_tag)
+            except Exception as e:
+                app.logger.error(f"{datetime.now()}: Batch run {report_tag} error: {str(e)}")
+                print(f"\nUnexpected error: {e}")
+                failed_jobs.append(report_tag)
+    except KeyboardInterrupt:
+        print("\n\nApplication interrupted by user.")
+        sys.exit(1)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if failed_jobs:
+        print(f"\r\n{len(failed_jobs)} of {len(jobs)} runs failed: {', '.join(failed_jobs)}, please check error in log file!")
+        sys.exit(1)
+    print(f"\r\nAll {len(jobs)} runs have been processed successfully, please check reports!")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
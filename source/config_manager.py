@@ -22,6 +22,14 @@ class ConfigManager:
             'quotation': {
                 'input_path': 'sample/inputs',
                 'input_sheet': '2025',
+                'workers': 1,
+                'engine': 'auto',
+                'streaming': False,
+                'cache': {
+                    'enabled': False,
+                    'path': '.quotation_cache',
+                    'max_size_mb': 200
+                },
                 'area1': {
                     'process': True,
                     'suffix': '1'
@@ -34,8 +42,13 @@ class ConfigManager:
             'report': {
                 'output_path': 'sample/outputs',
                 'template_path': 'templates',
+                'pipeline': False,
+                'writer': 'openpyxl',
+                'parallel_areas': False,
+                'export_matrix': False,
                 'area1': {
                     'template_file': 'TEMPLATE_AREA_1.XLSX',
+                    'top_k': 4,
                     '20feet': {
                         'report_sheet': '운임견적(20피트)',
                         'bestprices_sheet': 'AREA 1 - 20FT'
@@ -47,6 +60,7 @@ class ConfigManager:
                 },
                 'area2': {
                     'template_file': 'TEMPLATE_AREA_2.XLSX',
+                    'top_k': 4,
                     '20feet': {
                         'report_sheet': '운임견적(20피트)',
                         'bestprices_sheet': 'AREA 2 - 20FT'
@@ -56,6 +70,27 @@ class ConfigManager:
                         'bestprices_sheet': 'AREA 2 - 40HC'
                     }
                 }
+            },
+            'metrics': {
+                'enabled': False,
+                'file': 'quotation.metrics.jsonl',
+                'memory': False,
+                'show_eta': True
+            },
+            'watch': {
+                'interval': 2,
+                'debounce': 5
+            },
+            'archive': {
+                'enabled': False,
+                'path': 'archive'
+            },
+            'service': {
+                'host': '127.0.0.1',
+                'port': 8080,
+                'workspace': 'service',
+                'max_upload_mb': 100,
+                'keep_jobs': 50
             }
         }
         
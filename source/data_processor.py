@@ -1,105 +1,291 @@
 import os
+import heapq
+import zipfile
+import numpy as np
 import pandas as pd
-from typing import Tuple, Dict, Any
+from typing import Dict, Any, Optional, Union, BinaryIO, Iterator, List
+
+from template_index import TemplateIndex
+from quotation_cache import QuotationCache
+from run_metrics import RunMetrics
+
+
+# Partner sheet columns read for a quotation: port, paired 20ft/40ft costs and shared surcharges
+QUOTATION_COLUMNS = [0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+# Column positions within QUOTATION_COLUMNS of the 20ft and 40ft quotations
+COLUMNS_20FT = [0, 1, 3, 5, 6, 7, 8, 9, 10]
+COLUMNS_40FT = [0, 2, 4, 5, 6, 7, 8, 9, 11]
+# Positions of the cost columns of each container type in the numeric block of QUOTATION_COLUMNS[1:]
+COST_COLUMNS = {
+    '20ft': [col - 1 for col in COLUMNS_20FT[1:]],
+    '40ft': [col - 1 for col in COLUMNS_40FT[1:]]
+}
+# Number of cheapest rows averaged into the cost of a port
+CHEAPEST_ROWS = 3
+STREAM_CHUNK_ROWS = 5000
+
+
+def get_excel_engine(engine: Optional[str] = 'auto') -> Optional[str]:
+    # auto prefers calamine when it is installed, None leaves the choice to pandas
+    if engine in (None, 'auto', 'calamine'):
+        try:
+            import python_calamine
+            return 'calamine'
+        except ImportError:
+            return None
+    return engine
+
+
+# Text cells pandas reads as missing values by default
+NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
 
 
 class DataProcessor:
     
-    def __init__(self, input_file_path: str, config: Dict[str, Any]):
+    def __init__(self, input_file_path: Union[str, BinaryIO], config: Dict[str, Any],
+                 metrics: Optional[RunMetrics] = None, file_name: Optional[str] = None,
+                 partner_name: Optional[str] = None):
+        # input_file_path may also be an open binary buffer, file_name then names the partner file
         self.input_file_path = input_file_path
         self.config = config
-        self.partner_name = self._extract_partner_name()
+        self.metrics = metrics or RunMetrics()
+        self.file_name = file_name or os.path.basename(input_file_path)
+        self.partner_name = partner_name or self._extract_partner_name()
     
     def _extract_partner_name(self) -> str:
-        filename = os.path.basename(self.input_file_path)
-        return filename[:(filename.find('.')-1)]
+        # The last character before the extension is the area suffix, BLIS1.xls is partner BLIS
+        filename = self.file_name
+        end = filename.find('.')
+        return filename[:(end if end >= 0 else len(filename)) - 1]
     
-    def _get_quotation_data(self, sheet: str, skip: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
-        df = pd.read_excel(self.input_file_path, sheet_name=sheet, skiprows=skip)
-        data20ft = df.iloc[:, [0,2,4,6,7,8,9,10,11]]
-        data40ft = df.iloc[:, [0,3,5,6,7,8,9,10,12]]
-        return data20ft, data40ft
+    def _get_excel_engine(self) -> Optional[str]:
+        return get_excel_engine(self.config.get('quotation', {}).get('engine', 'auto'))
+    
+    def _get_quotation_data(self, sheet: str, skip: int) -> pd.DataFrame:
+        return pd.read_excel(self.input_file_path, sheet_name=sheet, skiprows=skip, 
+                             usecols=QUOTATION_COLUMNS, engine=self._get_excel_engine())
+
+    def _iter_sheet_rows(self, sheet: str) -> Iterator[tuple]:
+        source = self.input_file_path
+        extension = os.path.splitext(self.file_name)[1].lower()
+        
+        if extension == '.xlsb':
+            try:
+                from python_calamine import CalamineWorkbook
+            except ImportError:
+                raise ValueError("Streaming .xlsb partner files needs python-calamine")
+            workbook = (CalamineWorkbook.from_path(source) if isinstance(source, str) 
+                        else CalamineWorkbook.from_filelike(source))
+            yield from workbook.get_sheet_by_name(sheet).to_python(skip_empty_area=False)
+            return
+        
+        import openpyxl as opxl
+        workbook = opxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            yield from workbook[sheet].iter_rows(max_col=QUOTATION_COLUMNS[-1] + 1, values_only=True)
+        finally:
+            workbook.close()
+
+    def _can_stream(self) -> bool:
+        # xlrd always loads a whole .xls sheet, so .xls files are read by the default reader instead
+        if os.path.splitext(self.file_name)[1].lower() == '.xlsb':
+            return True
+        
+        source = self.input_file_path
+        is_zip = zipfile.is_zipfile(source)
+        if not isinstance(source, str):
+            source.seek(0)
+        return is_zip
+
+    def _iter_quotation_chunks(self, sheet: str) -> Iterator[pd.DataFrame]:
+        rows = self._iter_sheet_rows(sheet)
+        header = next(rows, None)
+        width = len(header) if header is not None else 0
+        chunk = []
+        
+        for row in rows:
+            width = max(width, len(row))
+            # Empty and NA-like text cells are missing values, as pandas reads them
+            chunk.append([
+                None if isinstance(value, str) and value in NA_VALUES else value
+                for value in (row[col] if col < len(row) else None for col in QUOTATION_COLUMNS)
+            ])
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield pd.DataFrame(chunk, dtype=object)
+                chunk = []
+        
+        if width <= QUOTATION_COLUMNS[-1]:
+            raise ValueError(f"Sheet '{sheet}' of {self.file_name} has only {width} columns")
+        if chunk:
+            yield pd.DataFrame(chunk, dtype=object)
+
+    def _update_cheapest(self, cheapest: Dict[str, List[float]], totals: pd.DataFrame) -> None:
+        totals = totals.dropna(subset=[totals.columns[1]])
+        
+        # Max-heaps of negated costs keep the CHEAPEST_ROWS lowest costs of every port
+        for port, cost in zip(totals.iloc[:, 0], totals.iloc[:, 1].to_numpy(dtype=float)):
+            if not isinstance(port, str):
+                continue
+            heap = cheapest.get(port)
+            if heap is None:
+                cheapest[port] = [-cost]
+            elif len(heap) < CHEAPEST_ROWS:
+                heapq.heappush(heap, -cost)
+            elif cost < -heap[0]:
+                heapq.heapreplace(heap, -cost)
 
-    def _calculate_total_cost(self, data: pd.DataFrame) -> pd.DataFrame:
-        port = data.iloc[:,0].str.upper()
-        cost = data.iloc[:,1:9]
+    def _average_cheapest(self, cheapest: Dict[str, List[float]]) -> pd.DataFrame:
+        totals = np.zeros(len(cheapest))
+        counts = np.zeros(len(cheapest))
+        for idx, heap in enumerate(cheapest.values()):
+            # Add the costs cheapest first, in the same order as _calculate_average_port_cost
+            for cost in sorted(-value for value in heap):
+                totals[idx] += cost
+            counts[idx] = len(heap)
         
-        for i in range(len(cost.columns)):
-            cost.isetitem(i, pd.to_numeric(cost.iloc[:,i], errors='coerce'))
+        return pd.DataFrame({
+            'PORT': list(cheapest.keys()),
+            'TOTALCOST': np.round(totals / counts, 2)
+        })
+
+    def _stream_port_costs(self, sheet: str) -> Dict[str, pd.DataFrame]:
+        cheapest = {'20ft': {}, '40ft': {}}
+        rows = 0
         
-        cost.dropna(subset=[cost.columns[0]], inplace=True)
-        cost = cost[cost[cost.columns[0]] != 0]
+        for chunk in self._iter_quotation_chunks(sheet):
+            rows += len(chunk)
+            for container_type, totals in self._calculate_total_costs(chunk).items():
+                self._update_cheapest(cheapest[container_type], totals)
         
-        total_cost = cost.sum(axis=1, numeric_only=True)
+        self.metrics.record('stream', file=self.file_name, rows=rows,
+                            ports=max(len(cheapest['20ft']), len(cheapest['40ft'])))
+        return {container_type: self._average_cheapest(ports) for container_type, ports in cheapest.items()}
+
+    def _to_numeric_block(self, data: pd.DataFrame) -> np.ndarray:
+        # All cost columns, the surcharges shared by 20ft and 40ft included, are converted at once:
+        # numeric sheets with a single cast, sheets with text in them with one to_numeric on the flattened block
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes):
+            return np.ascontiguousarray(data.to_numpy(dtype=np.float64, na_value=np.nan))
+        values = data.to_numpy(dtype=object)
+        block = pd.to_numeric(values.ravel(), errors='coerce')
+        return np.asarray(block, dtype=np.float64).reshape(values.shape)
+
+    def _calculate_total_costs(self, data: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        port = data.iloc[:, 0].str.upper()
+        block = self._to_numeric_block(data.iloc[:, 1:])
+        missing = np.isnan(block)
+        filled = np.where(missing, 0.0, block)
         
-        return pd.DataFrame().assign(PORT=port, TOTALCOST=total_cost)
+        totals = {}
+        for container_type, columns in COST_COLUMNS.items():
+            # Rows whose first cost is missing or zero are not quoted, the other missing costs count as 0
+            first = block[:, columns[0]]
+            quoted = ~missing[:, columns[0]] & (first != 0)
+            # The C-ordered row sum adds the costs pairwise, as DataFrame.sum(axis=1) does once missing costs are filled
+            total_cost = np.where(quoted, filled[:, columns].sum(axis=1), np.nan)
+            totals[container_type] = pd.DataFrame({'PORT': port, 'TOTALCOST': total_cost})
+        
+        return totals
 
     def _calculate_average_port_cost(self, data: pd.DataFrame) -> pd.DataFrame:
-        data.dropna(subset=[data.columns[1]], inplace=True)
-        result_data = []
-        
-        for port in data[data.columns[0]].unique():
-            port_data = data[data[data.columns[0]] == port]
-            if len(port_data) >= 3:
-                min_3_values = port_data.nsmallest(3, data.columns[1])
-                avg_cost = min_3_values[data.columns[1]].mean()
-            else:
-                avg_cost = port_data[data.columns[1]].mean()
-            
-            result_data.append({
-                data.columns[0]: port,
-                data.columns[1]: round(avg_cost, 2)
-            })
-        
-        return pd.DataFrame(result_data)
-
-    def _prepare_forwarder_data(self, min_cost: pd.DataFrame, output_file: str, 
-                              sheet: str, skip: int) -> pd.DataFrame:
-        df = pd.read_excel(output_file, sheet_name=sheet, skiprows=skip)
-        
-        pod = df.loc[:, 'POD'].str.upper()
+        port_col, cost_col = data.columns[0], data.columns[1]
+        data = data.dropna(subset=[cost_col])
         
-        cost_mapping = dict(zip(min_cost[min_cost.columns[0]], min_cost[min_cost.columns[1]]))
+        codes, ports = pd.factorize(data[port_col])
+        costs = data[cost_col].to_numpy(dtype=float)
+        valid = codes >= 0
+        codes, costs = codes[valid], costs[valid]
         
-        partner_costs = pod.map(cost_mapping)
+        # Sort by port then cost, keep the 3 cheapest rows of every port
+        order = np.lexsort((costs, codes))
+        codes, costs = codes[order], costs[order]
+        rank = np.arange(len(codes)) - np.searchsorted(codes, codes, side='left')
+        cheapest = rank < CHEAPEST_ROWS
         
-        fwd_data = pd.DataFrame({
-            'POD': pod,
-            'PARTNER': self.partner_name,
-            'COST': partner_costs
-        })
+        totals = np.bincount(codes[cheapest], weights=costs[cheapest], minlength=len(ports))
+        counts = np.bincount(codes[cheapest], minlength=len(ports))
         
-        fwd_data = fwd_data.dropna(subset=['COST'])
+        return pd.DataFrame({
+            port_col: ports,
+            cost_col: np.round(totals / counts, 2)
+        })
+
+    def _prepare_forwarder_data(self, min_cost: pd.DataFrame, pod_names: np.ndarray) -> np.ndarray:
+        cost_mapping = dict(zip(min_cost[min_cost.columns[0]], min_cost[min_cost.columns[1]]))
         
-        return fwd_data
+        # One cost per template POD name, NaN where the partner does not quote it
+        return np.array([cost_mapping.get(pod, np.nan) for pod in pod_names], dtype=np.float64)
+
+    def get_port_costs(self, cache: Optional[QuotationCache] = None) -> Dict[str, pd.DataFrame]:
+        return self._get_port_costs(self.config['quotation']['input_sheet'], cache)
+
+    def _get_reader(self) -> str:
+        if self.config['quotation'].get('streaming', False) and self._can_stream():
+            return 'stream'
+        return self._get_excel_engine() or 'default'
 
-    def Run(self, output_file: str, sheet_20ft: str, sheet_40ft: str) -> Dict[str, Any]:
-        input_sheet = self.config['quotation']['input_sheet']
+    def _get_port_costs(self, input_sheet: str, cache: Optional[QuotationCache]) -> Dict[str, pd.DataFrame]:
+        reader = self._get_reader()
+        cache_key = cache.make_key(self.input_file_path, input_sheet, 0, reader) if cache else None
+        if cache:
+            with self.metrics.stage('cache_lookup', file=self.file_name):
+                port_costs = cache.get(cache_key)
+            if port_costs is not None:
+                return port_costs
         
-        data20ft, data40ft = self._get_quotation_data(input_sheet, 0)
+        if reader == 'stream':
+            with self.metrics.stage('stream_read', file=self.file_name):
+                port_costs = self._stream_port_costs(input_sheet)
+        else:
+            with self.metrics.stage('read', file=self.file_name):
+                data = self._get_quotation_data(input_sheet, 0)
 
-        sum20 = self._calculate_total_cost(data20ft)
-        sum40 = self._calculate_total_cost(data40ft)
+            with self.metrics.stage('total_cost', file=self.file_name, rows=len(data)):
+                totals = self._calculate_total_costs(data)
 
-        min_sum20 = self._calculate_average_port_cost(sum20)
-        min_sum40 = self._calculate_average_port_cost(sum40)
+            with self.metrics.stage('port_average', file=self.file_name):
+                port_costs = {
+                    container_type: self._calculate_average_port_cost(total_cost)
+                    for container_type, total_cost in totals.items()
+                }
+        
+        if cache:
+            cache.put(cache_key, port_costs)
+        
+        return port_costs
+
+    def Run(self, output_file: str, sheet_20ft: str, sheet_40ft: str,
+            template_index: Optional[TemplateIndex] = None,
+            cache: Optional[QuotationCache] = None) -> Dict[str, Any]:
+        if template_index is None:
+            template_index = TemplateIndex(output_file, [sheet_20ft, sheet_40ft])
+        
+        with self.metrics.stage('file', file=self.file_name):
+            port_costs = self.get_port_costs(cache)
+            return self.map_port_costs(port_costs, sheet_20ft, sheet_40ft, template_index)
 
-        fwd_data_20 = self._prepare_forwarder_data(
-            min_sum20, output_file, sheet_20ft, 3
-        )
-        fwd_data_40 = self._prepare_forwarder_data(
-            min_sum40, output_file, sheet_40ft, 3
-        )
+    def map_port_costs(self, port_costs: Dict[str, pd.DataFrame], sheet_20ft: str, sheet_40ft: str,
+                       template_index: TemplateIndex) -> Dict[str, Any]:
+        with self.metrics.stage('pod_mapping', file=self.file_name):
+            fwd_data_20 = self._prepare_forwarder_data(
+                port_costs['20ft'], template_index.report_sheet(sheet_20ft).pod_names
+            )
+            fwd_data_40 = self._prepare_forwarder_data(
+                port_costs['40ft'], template_index.report_sheet(sheet_40ft).pod_names
+            )
 
         return {
             '20ft': {
                 'partner': self.partner_name,
-                'data': fwd_data_20,
+                'costs': fwd_data_20,
                 'sheet': sheet_20ft
             },
             '40ft': {
                 'partner': self.partner_name,
-                'data': fwd_data_40,
+                'costs': fwd_data_40,
                 'sheet': sheet_40ft
             }
         } 
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import json
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+
+MATRIX_VERSION = 1
+MATRIX_ARRAYS = ['pods', 'partners', 'costs', 'rank_partner', 'rank_cost']
+
+
+class BestPricesRanking:
+
+    def __init__(self, pods: List[str], partners: List[str], costs: np.ndarray, top: int):
+        self.pods = pods
+        self.partners = partners
+        self.costs = costs
+        self.top = top
+
+        ranked = np.argsort(costs, axis=1, kind='stable')[:, :top]
+        self.counts = np.minimum((~np.isnan(costs)).sum(axis=1), top)
+
+        # Always top columns wide; ranks past the number of quoting partners are -1 / NaN
+        valid = np.arange(ranked.shape[1]) < self.counts[:, None]
+        self.rank_partner = np.full((len(pods), top), -1, dtype=np.int32)
+        self.rank_cost = np.full((len(pods), top), np.nan)
+        self.rank_partner[:, :ranked.shape[1]] = np.where(valid, ranked, -1)
+        self.rank_cost[:, :ranked.shape[1]] = np.where(valid, np.take_along_axis(costs, ranked, axis=1), np.nan)
+
+    def to_dict(self) -> Dict[str, list]:
+        result = {}
+        for idx, pod in enumerate(self.pods):
+            result[pod.upper()] = [
+                (self.partners[self.rank_partner[idx, rank]], self.rank_cost[idx, rank])
+                for rank in range(self.counts[idx])
+            ]
+        return result
+
+
+class MatrixExport:
+
+    def __init__(self, report_file: str):
+        self.report_file = report_file
+        self.matrix_path = f"{report_file}.matrix"
+        self.containers: Dict[str, BestPricesRanking] = {}
+
+    def add(self, container_type: str, ranking: BestPricesRanking) -> None:
+        self.containers[container_type] = ranking
+
+    def _save_array(self, name: str, array: np.ndarray) -> None:
+        path = os.path.join(self.matrix_path, f"{name}.npy")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.save(file, array, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    def save(self) -> None:
+        os.makedirs(self.matrix_path, exist_ok=True)
+        index = {
+            'version': MATRIX_VERSION,
+            'report_file': os.path.basename(self.report_file),
+            'containers': {}
+        }
+
+        for container_type, ranking in self.containers.items():
+            # Fixed width unicode arrays so every file can be memory-mapped without pickle
+            arrays = {
+                'pods': np.array([pod.upper() for pod in ranking.pods], dtype=str),
+                'partners': np.array([str(partner) for partner in ranking.partners], dtype=str),
+                'costs': np.ascontiguousarray(ranking.costs, dtype=np.float64),
+                'rank_partner': ranking.rank_partner,
+                'rank_cost': ranking.rank_cost
+            }
+            for name, array in arrays.items():
+                self._save_array(f"{container_type}_{name}", array)
+
+            index['containers'][container_type] = {
+                'pods': len(ranking.pods),
+                'partners': [str(partner) for partner in ranking.partners],
+                'top_k': ranking.top
+            }
+
+        tmp_file = os.path.join(self.matrix_path, f"index.json.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump(index, file, ensure_ascii=False)
+        os.replace(tmp_file, os.path.join(self.matrix_path, 'index.json'))
+
+
+def load_matrix(report_file: str, container_type: str, mmap_mode: Optional[str] = 'r') -> Dict[str, Any]:
+    matrix_path = f"{report_file}.matrix"
+    with open(os.path.join(matrix_path, 'index.json'), 'r', encoding='utf-8') as file:
+        index = json.load(file)
+    if index.get('version') != MATRIX_VERSION:
+        raise ValueError(f"Unsupported matrix version in '{matrix_path}'")
+
+    matrix = {
+        name: np.load(os.path.join(matrix_path, f"{container_type}_{name}.npy"), mmap_mode=mmap_mode)
+        for name in MATRIX_ARRAYS
+    }
+    matrix['top_k'] = index['containers'][container_type]['top_k']
+    return matrix
\ No newline at end of file
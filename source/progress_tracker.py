@@ -1,17 +1,56 @@
 import sys
+import time
+from typing import Optional, Tuple
+
+from run_metrics import RunMetrics
 
 
 class ProgressTracker:
-    
-    def __init__(self):
+
+    def __init__(self, show_eta: bool = False, metrics: Optional[RunMetrics] = None, show_bar: bool = True):
         self.bar_length = 100
-    
-    def print_progress_bar(self, progress: float) -> None:
+        self.show_bar = show_bar
+        self.show_eta = show_eta
+        self.metrics = metrics
+        self.phase = None
+        self.start_time = None
+        self.start_count = 0
+
+    def start(self, phase: str, current: int = 0) -> None:
+        self.phase = phase
+        self.start_time = time.perf_counter()
+        self.start_count = current
+
+    def get_throughput(self, current: int, total: int) -> Tuple[Optional[float], Optional[float]]:
+        if self.start_time is None:
+            return None, None
+
+        elapsed = time.perf_counter() - self.start_time
+        done = current - self.start_count
+        if elapsed <= 0 or done <= 0:
+            return None, None
+
+        rate = done / elapsed
+        return rate, (total - current) / rate
+
+    def print_progress_bar(self, progress: float, suffix: str = '') -> None:
         filled_length = int(self.bar_length * progress)
         bar = '[' + '#' * filled_length + ' ' * (self.bar_length - filled_length) + ']'
-        sys.stdout.write('\r' + bar + ' %d%%' % (progress * 100))
+        sys.stdout.write('\r' + bar + ' %d%%' % (progress * 100) + suffix)
         sys.stdout.flush()
-    
+
     def update_progress(self, current: int, total: int) -> None:
-        if total > 0:
-            self.print_progress_bar(current / total) 
\ No newline at end of file
+        if total <= 0:
+            return
+
+        rate, eta = self.get_throughput(current, total)
+        if self.show_bar:
+            suffix = ''
+            if self.show_eta and rate is not None:
+                suffix = ' %.2f files/s ETA %ds   ' % (rate, round(eta))
+            self.print_progress_bar(current / total, suffix)
+
+        if self.metrics is not None and current > self.start_count:
+            self.metrics.record('progress', phase=self.phase, done=current, total=total,
+                                files_per_s=None if rate is None else round(rate, 3),
+                                eta_s=None if eta is None else round(eta, 3))
\ No newline at end of file
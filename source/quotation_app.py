@@ -2,40 +2,139 @@ import os
 import sys
 import logging
 import shutil
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from datetime import datetime
+from typing import Optional, List, Tuple
 
 from config_manager import ConfigManager
 from progress_tracker import ProgressTracker
 from data_processor import DataProcessor
 from report_generator import ReportGenerator
+from template_index import TemplateIndex, build_template_index
+from quotation_cache import QuotationCache, file_digest
+from run_manifest import RunManifest
+from run_metrics import RunMetrics, create_run_metrics
+from run_profiler import RunProfiler
+from rate_archive import RateArchive
+from quotation_plan import check_environment, collect_tasks, generate_report_filename
+
+
+def _run_data_processor(input_file_path: str, config: dict, report_file: str,
+                        sheet_20ft: str, sheet_40ft: str, template_index: TemplateIndex,
+                        cache: Optional[QuotationCache] = None, metrics: Optional[RunMetrics] = None) -> dict:
+    data_processor = DataProcessor(input_file_path, config, metrics)
+    return data_processor.Run(report_file, sheet_20ft, sheet_40ft, template_index, cache)
+
+
+def _run_area_pipeline(config_path: str, area: str, workers: Optional[int], pipeline: Optional[bool],
+                       input_sheet: Optional[str] = None, report_tag: Optional[str] = None) -> Tuple[str, bool, bool]:
+    app = QuotationApp(config_path, workers=workers, pipeline=pipeline, areas=[area], show_progress=False,
+                       input_sheet=input_sheet, report_tag=report_tag)
+    if not app.process_quotations():
+        return area, False, False
+    return area, True, app.generate_best_prices()
 
 
 class QuotationApp:
     
-    def __init__(self, config_path: str = 'config.yaml'):
+    def __init__(self, config_path: str = 'config.yaml', workers: Optional[int] = None,
+                 pipeline: Optional[bool] = None, incremental: bool = False,
+                 parallel_areas: Optional[bool] = None, areas: Optional[List[str]] = None,
+                 show_progress: bool = True, input_sheet: Optional[str] = None, report_tag: Optional[str] = None,
+                 executor: Optional[Executor] = None, template_cache: Optional[dict] = None,
+                 watch: bool = False, interval: Optional[float] = None, profile: Optional[str] = None,
+                 config: Optional[dict] = None):
+        self.config_path = config_path
         self.config_manager = ConfigManager(config_path)
-        self.progress_tracker = ProgressTracker()
         self.logger = self._setup_logging()
         
-        config, err = self.config_manager.load_config()
-        if err:
-            self.config_manager.create_template()
-            self.logger.error(f"{datetime.now()}: File configuration '{config_path}' not found, template file has been generated!")
-            sys.exit()
+        # An already loaded configuration (service jobs) is used as is instead of reading config_path
+        if config is None:
+            config, err = self.config_manager.load_config()
+            if err:
+                self.config_manager.create_template()
+                self.logger.error(f"{datetime.now()}: File configuration '{config_path}' not found, template file has been generated!")
+                sys.exit()
+        
+        if input_sheet is not None:
+            config['quotation']['input_sheet'] = input_sheet
         
         self.config = config
-        self.report_generator = ReportGenerator(config)
+        self.input_sheet = input_sheet
+        self.report_tag = report_tag
+        self.executor = executor
+        self.template_cache = template_cache if template_cache is not None else {}
+        self.metrics = create_run_metrics(config)
+        self.progress_tracker = ProgressTracker(config.get('metrics', {}).get('show_eta', False), self.metrics,
+                                                show_progress)
+        self.workers = self._resolve_workers(workers)
+        self.template_indexes = {}
+        self.pipeline = pipeline if pipeline is not None else config['report'].get('pipeline', False)
+        self.pending_reports = {}
+        self.incremental = incremental
+        self.watch = watch
+        self.watch_interval = interval
+        self.parallel_areas = (parallel_areas if parallel_areas is not None 
+                               else config['report'].get('parallel_areas', False))
+        self.areas = areas or ['area1', 'area2']
+        self.cache = self._create_cache()
+        self.report_generator = ReportGenerator(config, self.metrics)
+        self.profiler = RunProfiler(profile)
+        self.archive = self._create_archive()
+        if self.profiler.enabled:
+            self._prepare_profiling()
     
     def _setup_logging(self) -> logging.Logger:
         logging.basicConfig(filename='quotation.log', level=logging.INFO)
         return logging.getLogger(__name__)
     
+    def _resolve_workers(self, workers: Optional[int]) -> int:
+        if workers is None:
+            workers = self.config['quotation'].get('workers', 1)
+        if not workers or workers < 1:
+            workers = os.cpu_count() or 1
+        return workers
+    
+    def _prepare_profiling(self) -> None:
+        # cProfile and tracemalloc only see this process, so partner files are parsed in it
+        if self.workers > 1 or self.parallel_areas or self.executor is not None:
+            self.logger.info(f"{datetime.now()}: Profiling runs with 1 worker and without parallel areas")
+        self.workers = 1
+        self.parallel_areas = False
+        self.executor = None
+        # Metrics memory tracking would restart tracemalloc inside the profiled phases
+        self.metrics.memory = False
+    
+    def _create_cache(self) -> Optional[QuotationCache]:
+        cache_config = self.config['quotation'].get('cache', {})
+        if not cache_config.get('enabled', False):
+            return None
+        return QuotationCache(cache_config.get('path', '.quotation_cache'), cache_config.get('max_size_mb', 200))
+    
+    def _create_archive(self) -> Optional[RateArchive]:
+        archive_config = self.config.get('archive', {})
+        if not archive_config.get('enabled', False):
+            return None
+        return RateArchive(archive_config.get('path', 'archive'))
+    
+    def _archive_rates(self, area: str, partners_data: dict) -> None:
+        if self.archive is None:
+            return
+        
+        # The reports are already written, a failing archive must not fail the run
+        try:
+            with self.metrics.stage('archive', area=area):
+                template_index = self._get_template_index(area)
+                pod_names = {container_type: template_index.report_sheet(sheet).pod_names
+                             for container_type, sheet in self._get_report_sheets(area).items()}
+                self.archive.append(area, partners_data, pod_names, str(self.config['quotation']['input_sheet']),
+                                    report_tag=self.report_tag)
+        except Exception as e:
+            self.logger.error(f"{datetime.now()}: Archive rates of {area} error: {str(e)}")
+    
     def _generate_report_filename(self, area: str) -> str:
-        now = datetime.now()
-        month = now.strftime("%B").upper()
-        year = now.strftime("%y")
-        area_num = area.replace('area', '')
-        return f"QUOTATION_{month}_{year}_AREA_{area_num}.XLSX"
+        return generate_report_filename(area, self.report_tag)
     
     def _copy_template_to_output(self, area: str) -> str:
         template_path = self.config['report']['template_path']
@@ -48,57 +147,39 @@ class QuotationApp:
         
         try:
             shutil.copy2(source_template, destination_file)
+            # The manifest described the report being replaced, --incremental must not trust it any more
+            RunManifest(destination_file).remove()
             self.logger.info(f"{datetime.now()}: Template copied: {template_file} -> {report_filename}")
             return destination_file
         except Exception as e:
             self.logger.error(f"{datetime.now()}: Failed to copy template {template_file}: {str(e)}")
             raise e
     
+    def _get_template_index(self, area: str) -> TemplateIndex:
+        if area not in self.template_indexes:
+            template_path = self.config['report']['template_path']
+            area_config = self.config['report'][area]
+            template_file = os.path.join(template_path, area_config['template_file'])
+            
+            # Apps of one batch share parsed templates, keyed by file version and sheet layout
+            key = (os.path.abspath(template_file), os.path.getmtime(template_file),
+                   tuple(area_config[size][sheet] for size in ['20feet', '40feet'] 
+                         for sheet in ['report_sheet', 'bestprices_sheet']))
+            if key not in self.template_cache:
+                with self.metrics.stage('template_index', area=area):
+                    self.template_cache[key] = build_template_index(template_file, area_config)
+            self.template_indexes[area] = self.template_cache[key]
+        return self.template_indexes[area]
+    
+    def load_templates(self) -> None:
+        for area in self._get_enabled_areas():
+            self._get_template_index(area)
+    
     def _validate_environment(self) -> bool:
-        input_path = self.config['quotation']['input_path']
-        output_path = self.config['report']['output_path']
-        template_path = self.config['report']['template_path']
-        
-        if not os.path.exists(input_path):
-            self.logger.error(f"{datetime.now()}: Input file path '{input_path}' not found")
-            return False
-        
-        if not os.path.exists(output_path):
-            self.logger.error(f"{datetime.now()}: Output file path '{output_path}' not found")
-            return False
-        
-        if not os.path.exists(template_path):
-            self.logger.error(f"{datetime.now()}: Template file path '{template_path}' not found")
-            return False
-        
-        area1 = self.config['quotation']['area1'].get('process', False)
-        area2 = self.config['quotation']['area2'].get('process', False)
-        
-        if area1:
-            area1_template = os.path.join(template_path, self.config['report']['area1']['template_file'])
-            if not os.path.exists(area1_template):
-                self.logger.error(f"{datetime.now()}: Template file '{area1_template}' not found")
-                return False
-        
-        if area2:
-            area2_template = os.path.join(template_path, self.config['report']['area2']['template_file'])
-            if not os.path.exists(area2_template):
-                self.logger.error(f"{datetime.now()}: Template file '{area2_template}' not found")
-                return False
-        
-        return True
-
-    def _determine_file_area(self, filename: str, area1_suffix: str, area2_suffix: str) -> str:
-        filename_lower = filename.lower()
-        if (filename_lower.endswith(area1_suffix + '.xls') or 
-            filename.endswith(area1_suffix + '.xlsx') or 
-            filename.endswith(area1_suffix + '.xlsb')):
-            return 'area1'
-        elif (filename_lower.endswith(area2_suffix + '.xls') or 
-              filename.endswith(area2_suffix + '.xlsx') or 
-              filename.endswith(area2_suffix + '.xlsb')):
-            return 'area2'
-        return None
+        errors = check_environment(self.config)
+        for error in errors:
+            self.logger.error(f"{datetime.now()}: {error}")
+        return not errors
 
     def _get_area_config(self, area: str) -> dict:
         area_config = self.config['report'][area]
@@ -113,12 +194,15 @@ class QuotationApp:
             area_config = self._get_area_config(area)
             
             input_file_path = os.path.join(input_path, input_file)
-            data_processor = DataProcessor(input_file_path, self.config)
-            
-            forwarder_data = data_processor.Run(
+            forwarder_data = _run_data_processor(
+                input_file_path,
+                self.config,
                 report_file, 
                 area_config['20feet_sheet'], 
-                area_config['40feet_sheet']
+                area_config['40feet_sheet'],
+                self._get_template_index(area),
+                self.cache,
+                self.metrics
             )
 
             return forwarder_data
@@ -127,6 +211,64 @@ class QuotationApp:
             self.logger.error(f"{datetime.now()}: Process quotation file {input_file} error: {str(e)}")
             return None
 
+    def _process_files_in_pool(self, tasks: list, input_path: str, report_files: dict,
+                               processed: int, total: int) -> list:
+        if self.executor is not None:
+            return self._submit_files(self.executor, tasks, input_path, report_files, processed, total)
+        
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as executor:
+            return self._submit_files(executor, tasks, input_path, report_files, processed, total)
+
+    def _submit_files(self, executor: Executor, tasks: list, input_path: str, report_files: dict,
+                      processed: int, total: int) -> list:
+        results = [None] * len(tasks)
+        futures = {}
+        
+        for idx, (input_file, area) in enumerate(tasks):
+            area_config = self._get_area_config(area)
+            future = executor.submit(
+                _run_data_processor,
+                os.path.join(input_path, input_file),
+                self.config,
+                report_files[area],
+                area_config['20feet_sheet'],
+                area_config['40feet_sheet'],
+                self._get_template_index(area),
+                self.cache,
+                self.metrics
+            )
+            futures[future] = idx
+        
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                self.logger.error(f"{datetime.now()}: Process quotation file {tasks[idx][0]} error: {str(e)}")
+            
+            processed += 1
+            self.progress_tracker.update_progress(processed, total)
+        
+        return results
+
+    def _get_enabled_areas(self) -> List[str]:
+        return [area for area in self.areas if self.config['quotation'][area].get('process', False)]
+
+    def _collect_tasks(self, input_files: list) -> list:
+        return collect_tasks(self.config, input_files, self.areas)
+
+    def _process_tasks(self, tasks: list, input_path: str, report_files: dict,
+                       processed: int, total: int) -> list:
+        if (self.executor is not None or self.workers > 1) and len(tasks) > 1:
+            return self._process_files_in_pool(tasks, input_path, report_files, processed, total)
+        
+        results = []
+        for input_file, area in tasks:
+            results.append(self._process_single_file_with_template(input_file, input_path, area, report_files[area]))
+            processed += 1
+            self.progress_tracker.update_progress(processed, total)
+        return results
+
     def process_quotations(self) -> bool:
         if not self._validate_environment():
             return False
@@ -134,86 +276,255 @@ class QuotationApp:
         input_path = self.config['quotation']['input_path']
         area1 = self.config['quotation']['area1'].get('process', False)
         area2 = self.config['quotation']['area2'].get('process', False)
-        area1_suffix = self.config['quotation']['area1']['suffix']
-        area2_suffix = self.config['quotation']['area2']['suffix']
 
-        input_files = os.listdir(input_path)
+        input_files = sorted(os.listdir(input_path))
         if not input_files:
             self.logger.info(f"{datetime.now()}: Input file path '{input_path}' is empty")
             return True
 
-        processed = 0
         total = len(input_files)
         failed_files = []
+        tasks = self._collect_tasks(input_files)
+        
+        report_files = {}
+        for _, area in tasks:
+            if area not in report_files:
+                report_files[area] = self._copy_template_to_output(area)
+        
+        processed = total - len(tasks)
+        self.progress_tracker.start('quotations', processed)
+        self.progress_tracker.update_progress(processed, total)
+        start = time.perf_counter()
+        with self.profiler.phase('ingestion'):
+            results = self._process_tasks(tasks, input_path, report_files, processed, total)
+        self._record_throughput('quotations', len(tasks), time.perf_counter() - start)
         
         area1_partners = {'20ft': [], '40ft': []}
         area2_partners = {'20ft': [], '40ft': []}
-        area1_report_file = None
-        area2_report_file = None
+        area1_report_file = report_files.get('area1')
+        area2_report_file = report_files.get('area2')
+        partner_files = {'area1': [], 'area2': []}
         
-        for input_file in input_files:
-            self.progress_tracker.update_progress(processed, total)
-            processed += 1
-
-            area = self._determine_file_area(input_file, area1_suffix, area2_suffix)
+        for (input_file, area), partner_data in zip(tasks, results):
+            if not partner_data:
+                failed_files.append(input_file)
+                continue
             
-            if area == 'area1' and area1:
-                if not area1_report_file:
-                    area1_report_file = self._copy_template_to_output('area1')
+            partners = area1_partners if area == 'area1' else area2_partners
+            partners['20ft'].append(partner_data['20ft'])
+            partners['40ft'].append(partner_data['40ft'])
+            partner_files[area].append(input_file)
+        
+        if failed_files:
+            self.logger.warning(f"{datetime.now()}: Failed to process {len(failed_files)} files: {failed_files}")
+        
+        # A failed file leaves the best prices unbuilt, the partners that succeeded are still written below
+        if self.pipeline and not failed_files:
+            if area1 and area1_partners['20ft'] and area1_report_file:
+                self.pending_reports['area1'] = (area1_partners, area1_report_file, partner_files['area1'])
+            if area2 and area2_partners['20ft'] and area2_report_file:
+                self.pending_reports['area2'] = (area2_partners, area2_report_file, partner_files['area2'])
+            return True
+        
+        try:
+            with self.profiler.phase('report'):
+                if area1 and area1_partners['20ft'] and area1_report_file:
+                    self.report_generator.write_all_partners_data(area1_partners, area1_report_file, 
+                                                                  self._get_template_index('area1'))
+                    self._archive_rates('area1', area1_partners)
                 
-                partner_data = self._process_single_file_with_template(input_file, input_path, 'area1', area1_report_file)
-                if partner_data:
-                    area1_partners['20ft'].append(partner_data['20ft'])
-                    area1_partners['40ft'].append(partner_data['40ft'])
-                else:
-                    failed_files.append(input_file)
-            elif area == 'area2' and area2:
-                if not area2_report_file:
-                    area2_report_file = self._copy_template_to_output('area2')
+                if area2 and area2_partners['20ft'] and area2_report_file:
+                    self.report_generator.write_all_partners_data(area2_partners, area2_report_file, 
+                                                                  self._get_template_index('area2'))
+                    self._archive_rates('area2', area2_partners)
                 
-                partner_data = self._process_single_file_with_template(input_file, input_path, 'area2', area2_report_file)
-                if partner_data:
-                    area2_partners['20ft'].append(partner_data['20ft'])
-                    area2_partners['40ft'].append(partner_data['40ft'])
-                else:
-                    failed_files.append(input_file)
+        except Exception as e:
+            self.logger.error(f"{datetime.now()}: Write partner data error: {str(e)}")
+            return False
+        
+        return len(failed_files) == 0
+
+    def _record_throughput(self, phase: str, files: int, wall_time: float) -> None:
+        files_per_s = files / wall_time if wall_time > 0 else None
+        self.metrics.record('throughput', phase=phase, files=files, workers=self.workers, wall_s=round(wall_time, 6),
+                            files_per_s=None if files_per_s is None else round(files_per_s, 3))
+        if files:
+            self.logger.info(f"{datetime.now()}: Processed {files} files in {wall_time:.2f}s with {self.workers} workers")
+
+    def _get_report_sheets(self, area: str) -> dict:
+        area_config = self._get_area_config(area)
+        return {'20ft': area_config['20feet_sheet'], '40ft': area_config['40feet_sheet']}
+
+    def _save_manifest(self, area: str, report_file: str, partner_files: list, partners_data: dict) -> None:
+        input_path = self.config['quotation']['input_path']
+        template_index = self._get_template_index(area)
+        
+        manifest = RunManifest(report_file)
+        manifest.template_file = self.config['report'][area]['template_file']
+        manifest.input_sheet = self.config['quotation']['input_sheet']
+        
+        for idx, input_file in enumerate(partner_files):
+            partner_data = {container_type: partners_data[container_type][idx] for container_type in ['20ft', '40ft']}
+            file_hash = file_digest(os.path.join(input_path, input_file))
+            manifest.set_partner(None, input_file, file_hash, partner_data, template_index)
+        
+        manifest.save()
+
+    def _load_manifest(self, area: str, report_file: str, area_files: list) -> Optional[RunManifest]:
+        manifest = RunManifest(report_file)
+        if not os.path.exists(report_file) or not manifest.load():
+            return None
+        
+        template_file = self.config['report'][area]['template_file']
+        input_sheet = self.config['quotation']['input_sheet']
+        if not manifest.is_compatible(template_file, input_sheet, self._get_template_index(area), 
+                                      self._get_report_sheets(area)):
+            self.logger.info(f"{datetime.now()}: Manifest of {os.path.basename(report_file)} is outdated, rebuilding report")
+            return None
+        
+        removed_files = [partner['file'] for partner in manifest.partners if partner['file'] not in area_files]
+        if removed_files:
+            self.logger.info(f"{datetime.now()}: Files {removed_files} were removed, rebuilding {os.path.basename(report_file)}")
+            return None
+        
+        return manifest
+
+    def _update_area_report(self, area: str, manifest: RunManifest, area_results: list, file_hashes: dict) -> None:
+        template_index = self._get_template_index(area)
+        sheets = self._get_report_sheets(area)
+        
+        previous_data = {'20ft': [], '40ft': []}
+        for idx in range(len(manifest.partners)):
+            partner_data = manifest.get_partner_data(idx, template_index, sheets)
+            for container_type in ['20ft', '40ft']:
+                previous_data[container_type].append(partner_data[container_type])
+        
+        changed_partners = []
+        for input_file, partner_data in area_results:
+            idx = manifest.find_partner(input_file)
+            changed_partners.append(manifest.set_partner(idx, input_file, file_hashes[input_file], 
+                                                         partner_data, template_index))
+        
+        if not changed_partners:
+            self.logger.info(f"{datetime.now()}: Report {os.path.basename(manifest.report_file)} is up to date")
+            return
+        
+        partners_data = {'20ft': [], '40ft': []}
+        for idx in range(len(manifest.partners)):
+            partner_data = manifest.get_partner_data(idx, template_index, sheets)
+            for container_type in ['20ft', '40ft']:
+                partners_data[container_type].append(partner_data[container_type])
+        
+        self.report_generator.update_area_report(partners_data, previous_data, changed_partners, 
+                                                 manifest.report_file, self.config['report'][area], template_index)
+        manifest.save()
+        self._archive_rates(area, partners_data)
+        self.logger.info(f"{datetime.now()}: Report {os.path.basename(manifest.report_file)} updated for {len(changed_partners)} partner files")
+
+    def process_incremental(self) -> bool:
+        if not self._validate_environment():
+            return False
+        
+        input_path = self.config['quotation']['input_path']
+        output_path = self.config['report']['output_path']
+        tasks = self._collect_tasks(sorted(os.listdir(input_path)))
+        
+        manifests = {}
+        report_files = {}
+        file_hashes = {}
+        stale_tasks = []
+        
+        for area in ['area1', 'area2']:
+            area_files = [input_file for input_file, task_area in tasks if task_area == area]
+            if not area_files:
+                continue
+            
+            for input_file in area_files:
+                file_hashes[input_file] = file_digest(os.path.join(input_path, input_file))
+            
+            report_file = os.path.join(output_path, self._generate_report_filename(area))
+            manifest = self._load_manifest(area, report_file, area_files)
+            
+            if manifest:
+                manifests[area] = manifest
+                report_files[area] = report_file
+                for input_file in area_files:
+                    idx = manifest.find_partner(input_file)
+                    if idx is None or manifest.partners[idx]['hash'] != file_hashes[input_file]:
+                        stale_tasks.append((input_file, area))
             else:
-                continue    
+                report_files[area] = self._copy_template_to_output(area)
+                stale_tasks.extend((input_file, area) for input_file in area_files)
         
-        self.progress_tracker.update_progress(processed, total)
+        self.progress_tracker.start('incremental')
+        self.progress_tracker.update_progress(0, len(stale_tasks))
+        start = time.perf_counter()
+        with self.profiler.phase('ingestion'):
+            results = self._process_tasks(stale_tasks, input_path, report_files, 0, len(stale_tasks))
+        self._record_throughput('incremental', len(stale_tasks), time.perf_counter() - start)
         
+        failed_files = [input_file for (input_file, _), partner_data in zip(stale_tasks, results) if not partner_data]
         if failed_files:
             self.logger.warning(f"{datetime.now()}: Failed to process {len(failed_files)} files: {failed_files}")
         
         try:
-            if area1 and area1_partners['20ft'] and area1_report_file:
-                self.report_generator.write_all_partners_data(area1_partners, area1_report_file)
-            
-            if area2 and area2_partners['20ft'] and area2_report_file:
-                self.report_generator.write_all_partners_data(area2_partners, area2_report_file)
-                
+            with self.profiler.phase('report'):
+                self._write_incremental_reports(report_files, stale_tasks, results, manifests, file_hashes)
         except Exception as e:
-            self.logger.error(f"{datetime.now()}: Write partner data error: {str(e)}")
+            self.logger.error(f"{datetime.now()}: Update report error: {str(e)}")
             return False
         
         return len(failed_files) == 0
 
+    def _write_incremental_reports(self, report_files: dict, stale_tasks: list, results: list,
+                                   manifests: dict, file_hashes: dict) -> None:
+        for area, report_file in report_files.items():
+            area_results = [(input_file, partner_data) for (input_file, task_area), partner_data 
+                            in zip(stale_tasks, results) if task_area == area and partner_data]
+            
+            if area in manifests:
+                self._update_area_report(area, manifests[area], area_results, file_hashes)
+            elif area_results:
+                partners_data = {'20ft': [], '40ft': []}
+                for _, partner_data in area_results:
+                    partners_data['20ft'].append(partner_data['20ft'])
+                    partners_data['40ft'].append(partner_data['40ft'])
+                
+                self.report_generator.write_area_report(partners_data, report_file, self.config['report'][area], 
+                                                        self._get_template_index(area))
+                self._save_manifest(area, report_file, [input_file for input_file, _ in area_results], partners_data)
+                self._archive_rates(area, partners_data)
+
     def generate_best_prices(self) -> bool:
         processed = 0
+        self.progress_tracker.start('best_prices')
         
         try:
-            for area in ["area1", "area2"]:
+            for area in self.areas:
                 report_filename = self._generate_report_filename(area)
                 output_path = self.config['report']['output_path']
                 report_file = os.path.join(output_path, report_filename)
                 
-                if os.path.exists(report_file):
+                if area in self.pending_reports:
+                    partners_data, report_file, partner_files = self.pending_reports.pop(area)
+                    
+                    self.progress_tracker.update_progress(processed, 2)
+                    processed += 1
+                    
+                    with self.profiler.phase('report'):
+                        self.report_generator.write_area_report(partners_data, report_file, self.config['report'][area], 
+                                                                self._get_template_index(area))
+                        self._save_manifest(area, report_file, partner_files, partners_data)
+                    self._archive_rates(area, partners_data)
+                elif os.path.exists(report_file):
                     area_config = self.config['report'][area]
                     
                     self.progress_tracker.update_progress(processed, 2)
                     processed += 1
 
-                    self.report_generator.generate_and_write_best_prices(report_file, area_config)
+                    with self.profiler.phase('report'):
+                        self.report_generator.generate_and_write_best_prices(report_file, area_config, 
+                                                                             self._get_template_index(area))
             
             self.progress_tracker.update_progress(processed, 2)
             
@@ -223,15 +534,149 @@ class QuotationApp:
         
         return True
 
+    def process_areas_in_parallel(self) -> List[str]:
+        areas = self._get_enabled_areas()
+        failed_areas = []
+        
+        self.progress_tracker.start('areas')
+        self.progress_tracker.update_progress(0, len(areas))
+        
+        with ProcessPoolExecutor(max_workers=len(areas)) as executor:
+            futures = {
+                executor.submit(_run_area_pipeline, self.config_path, area, self.workers, self.pipeline,
+                                self.input_sheet, self.report_tag): area
+                for area in areas
+            }
+            
+            for done, future in enumerate(as_completed(futures), 1):
+                area = futures[future]
+                try:
+                    _, processed, best_prices = future.result()
+                except Exception as e:
+                    self.logger.error(f"{datetime.now()}: Area {area} pipeline error: {str(e)}")
+                    processed = best_prices = False
+                
+                if not processed:
+                    self.logger.error(f"{datetime.now()}: Area {area} quotation has been processed fail")
+                    failed_areas.append(area)
+                elif not best_prices:
+                    self.logger.error(f"{datetime.now()}: Area {area} best price list has been processed fail")
+                    failed_areas.append(area)
+                
+                self.progress_tracker.update_progress(done, len(areas))
+        
+        return sorted(failed_areas)
+
+    def _snapshot_inputs(self) -> dict:
+        input_path = self.config['quotation']['input_path']
+        snapshot = {}
+        for input_file, _ in self._collect_tasks(sorted(os.listdir(input_path))):
+            try:
+                stat = os.stat(os.path.join(input_path, input_file))
+            except OSError:
+                continue
+            snapshot[input_file] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _watch_update(self, snapshot: dict, previous: Optional[dict]) -> None:
+        changed = sorted(input_file for input_file in snapshot.keys() | (previous or {}).keys()
+                         if snapshot.get(input_file) != (previous or {}).get(input_file))
+        self.logger.info(f"{datetime.now()}: Input files changed, updating reports: {changed}")
+        
+        try:
+            with self.metrics.stage('watch_update', files=len(changed)):
+                updated = self.process_incremental()
+        except Exception as e:
+            self.logger.error(f"{datetime.now()}: Watch update error: {str(e)}")
+            updated = False
+        
+        status = "updated" if updated else "updated fail, please check error in log file"
+        print(f"\r\n{datetime.now():%Y-%m-%d %H:%M:%S} - {len(changed)} changed files, quotation report has been {status}!")
+
+    def watch_inputs(self) -> bool:
+        if not self._validate_environment():
+            return False
+        
+        watch_config = self.config.get('watch', {})
+        interval = self.watch_interval if self.watch_interval is not None else watch_config.get('interval', 2)
+        debounce = watch_config.get('debounce', 5)
+        input_path = self.config['quotation']['input_path']
+        
+        # Keep the worker processes alive between updates
+        owns_executor = self.executor is None and self.workers > 1
+        if owns_executor:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        
+        print(f"Watching '{input_path}' every {interval}s, press Ctrl+C to stop")
+        processed = None
+        pending = None
+        changed_at = None
+        
+        try:
+            while True:
+                snapshot = self._snapshot_inputs()
+                if snapshot != processed:
+                    # Wait until a burst of new or changing files has been quiet for the debounce time
+                    if snapshot != pending:
+                        pending, changed_at = snapshot, time.monotonic()
+                    if processed is None or time.monotonic() - changed_at >= debounce:
+                        self._watch_update(snapshot, processed)
+                        processed = snapshot
+                time.sleep(interval)
+        finally:
+            if owns_executor:
+                self.executor.shutdown()
+                self.executor = None
+
     def run(self) -> None:
+        if not self.execute():
+            sys.exit(1)
+
+    def execute(self) -> bool:
+        try:
+            with self.metrics.stage('run', incremental=self.incremental):
+                return self._execute()
+        finally:
+            self._save_profile()
+
+    def _save_profile(self) -> None:
+        profile_files = self.profiler.save()
+        if profile_files:
+            print(f"\r\nProfile written to {', '.join(profile_files)}")
+            self.logger.info(f"{datetime.now()}: Profile written to {profile_files}")
+
+    def _execute(self) -> bool:
+        if self.watch:
+            return self.watch_inputs()
+        
+        if self.incremental:
+            if self.process_incremental():
+                print("\r\nQuotation report has been updated successfully, please check report!")
+                return True
+            print("\r\nQuotation report has been updated fail, please check error in log file!")
+            return False
+        
+        if self.parallel_areas and len(self._get_enabled_areas()) > 1:
+            if not self._validate_environment():
+                print("\r\nQuotation has been processed fail, please check error in log file!")
+                return False
+            
+            failed_areas = self.process_areas_in_parallel()
+            if failed_areas:
+                print(f"\r\nQuotation of {', '.join(failed_areas)} has been processed fail, please check error in log file!")
+                return False
+            print("\r\nQuotation and best price list have been processed successfully, please check report!")
+            return True
+        
         if self.process_quotations():
             print("\r\nQuotation has been processed successfully, continue to select best price list!")
         else:
             print("\r\nQuotation has been processed fail, please check error in log file!")
-            sys.exit()
+            return False
 
         if self.generate_best_prices():
             print("\r\nBest price list has been processed successfully, please check report!")
-        else:
-            print("\r\nBest price list has been processed fail, please check error in log file!")
-            sys.exit() 
\ No newline at end of file
+            return True
+        
+        print("\r\nBest price list has been processed fail, please check error in log file!")
+        return False
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import zlib
+import hashlib
+import zipfile
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+
+CACHE_VERSION = 1
+CONTAINER_TYPES = ['20ft', '40ft']
+
+
+def file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class QuotationCache:
+
+    def __init__(self, cache_path: str, max_size_mb: float = 200):
+        self.cache_path = cache_path
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        os.makedirs(cache_path, exist_ok=True)
+
+    def make_key(self, input_file_path: str, input_sheet: str, skip: int, reader: str) -> str:
+        # The reader (streaming or the Excel engine) is part of the key, entries of another reader are not reused
+        key = f"{file_digest(input_file_path)}|{input_sheet}|{skip}|{reader}|{CACHE_VERSION}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_path, f"{key}.npz")
+
+    def get(self, key: str) -> Optional[Dict[str, pd.DataFrame]]:
+        path = self._entry_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                tables = {
+                    container_type: pd.DataFrame({
+                        'PORT': entry[f'{container_type}_port'],
+                        'TOTALCOST': entry[f'{container_type}_cost']
+                    })
+                    for container_type in CONTAINER_TYPES
+                }
+            os.utime(path)
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile, zlib.error):
+            # A missing, truncated or corrupt entry is a miss, the file is parsed again and the entry rewritten
+            return None
+        return tables
+
+    def put(self, key: str, tables: Dict[str, pd.DataFrame]) -> None:
+        arrays = {}
+        for container_type in CONTAINER_TYPES:
+            table = tables[container_type]
+            arrays[f'{container_type}_port'] = table.iloc[:, 0].to_numpy(dtype=str)
+            arrays[f'{container_type}_cost'] = table.iloc[:, 1].to_numpy(dtype=float)
+
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(tmp_path, path)
+
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.cache_path):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
\ No newline at end of file
@@ -0,0 +1,165 @@
+import io
+import os
+import hashlib
+import zipfile
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Union, BinaryIO
+
+from config_manager import ConfigManager
+from data_processor import DataProcessor
+from report_generator import ReportGenerator
+from template_index import TemplateIndex, build_template_index
+from matrix_export import BestPricesRanking
+from run_metrics import RunMetrics
+
+
+CONTAINER_TYPES = [('20ft', '20feet'), ('40ft', '40feet')]
+
+# A partner file given as a path, as (file name, content) when it only lives in memory, or as a binary file object
+PartnerSource = Union[str, os.PathLike, Tuple[str, Union[bytes, bytearray, memoryview]], BinaryIO]
+
+
+class QuotationResult:
+
+    def __init__(self, area: str, partners: List[str], rankings: Dict[str, BestPricesRanking]):
+        self.area = area
+        self.partners = partners
+        self.rankings = rankings
+
+    def costs(self, container_type: str) -> pd.DataFrame:
+        ranking = self.rankings[container_type]
+        return pd.DataFrame(ranking.costs, index=pd.Index([pod.upper() for pod in ranking.pods], name='POD'),
+                            columns=ranking.partners)
+
+    def best_prices(self, container_type: str) -> pd.DataFrame:
+        ranking = self.rankings[container_type]
+        rows, ranks = np.nonzero(ranking.rank_partner >= 0)
+        partners = np.asarray(ranking.partners, dtype=object)
+
+        return pd.DataFrame({
+            'POD': [ranking.pods[row].upper() for row in rows],
+            'RANK': ranks + 1,
+            'PARTNER': partners[ranking.rank_partner[rows, ranks]],
+            'COST': ranking.rank_cost[rows, ranks]
+        })
+
+
+class QuotationEngine:
+
+    def __init__(self, config: Union[str, Dict[str, Any]] = 'config.yaml', max_partners: int = 256,
+                 metrics: Optional[RunMetrics] = None):
+        if isinstance(config, str):
+            config_path = config
+            config, err = ConfigManager(config_path).load_config()
+            if err:
+                raise ValueError(f"File configuration '{config_path}' cannot be loaded: {err}")
+
+        self.config = config
+        self.max_partners = max_partners
+        self.metrics = metrics or RunMetrics()
+        self.report_generator = ReportGenerator(config, self.metrics)
+        self._port_costs: OrderedDict = OrderedDict()
+        self._templates: Dict[tuple, TemplateIndex] = {}
+        self._lock = threading.Lock()
+
+    def _read_source(self, source: PartnerSource) -> Tuple[str, Optional[str], bytes]:
+        # Returns the file name, the partner name when it does not follow from the file name, and the content
+        if isinstance(source, tuple):
+            file_name, content = source
+            return file_name, None, bytes(content)
+
+        if hasattr(source, 'read'):
+            content = source.read()
+            if not isinstance(content, (bytes, bytearray, memoryview)):
+                raise TypeError("Partner file objects must be opened in binary mode")
+            name = getattr(source, 'name', None)
+            if isinstance(name, (str, os.PathLike)):
+                return os.path.basename(name), None, bytes(content)
+            # A generated name has no area suffix, the partner is named after the whole name
+            file_name = self._generate_file_name(bytes(content))
+            return file_name, os.path.splitext(file_name)[0], bytes(content)
+
+        with open(source, 'rb') as file:
+            return os.path.basename(source), None, file.read()
+
+    def _generate_file_name(self, content: bytes) -> str:
+        # Unnamed buffers are named after their content, the extension follows the package format
+        extension = '.xls'
+        if zipfile.is_zipfile(io.BytesIO(content)):
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                extension = '.xlsb' if 'xl/workbook.bin' in archive.namelist() else '.xlsx'
+        return f"PARTNER_{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, pd.DataFrame]]:
+        with self._lock:
+            port_costs = self._port_costs.get(key)
+            if port_costs is not None:
+                self._port_costs.move_to_end(key)
+            return port_costs
+
+    def _cache_put(self, key: str, port_costs: Dict[str, pd.DataFrame]) -> None:
+        with self._lock:
+            self._port_costs[key] = port_costs
+            self._port_costs.move_to_end(key)
+            while len(self._port_costs) > self.max_partners:
+                self._port_costs.popitem(last=False)
+
+    def _get_port_costs(self, file_name: str, content: bytes) -> Dict[str, pd.DataFrame]:
+        input_sheet = str(self.config['quotation']['input_sheet'])
+        key = hashlib.sha256(content).hexdigest() + '|' + input_sheet
+
+        port_costs = self._cache_get(key)
+        if port_costs is None:
+            processor = DataProcessor(io.BytesIO(content), self.config, self.metrics, file_name)
+            port_costs = processor.get_port_costs()
+            self._cache_put(key, port_costs)
+        return port_costs
+
+    def port_costs(self, source: PartnerSource) -> Dict[str, pd.DataFrame]:
+        file_name, _, content = self._read_source(source)
+        return {container_type: table.copy() for container_type, table in self._get_port_costs(file_name, content).items()}
+
+    def template_index(self, area: str) -> TemplateIndex:
+        area_config = self.config['report'][area]
+        template_file = os.path.join(self.config['report']['template_path'], area_config['template_file'])
+        key = (os.path.abspath(template_file), os.path.getmtime(template_file), area)
+
+        with self._lock:
+            template_index = self._templates.get(key)
+        if template_index is None:
+            with self.metrics.stage('template_index', area=area):
+                template_index = build_template_index(template_file, area_config)
+            with self._lock:
+                self._templates = {cached_key: index for cached_key, index in self._templates.items()
+                                   if cached_key[2] != area}
+                self._templates[key] = template_index
+        return template_index
+
+    def quote(self, area: str, sources: List[PartnerSource]) -> QuotationResult:
+        area_config = self.config['report'][area]
+        template_index = self.template_index(area)
+        sheet_20ft = area_config['20feet']['report_sheet']
+        sheet_40ft = area_config['40feet']['report_sheet']
+
+        partners_data = {'20ft': [], '40ft': []}
+        partners = []
+        with self.metrics.stage('engine_quote', area=area, files=len(sources)):
+            for source in sources:
+                file_name, partner_name, content = self._read_source(source)
+                processor = DataProcessor(file_name, self.config, self.metrics, partner_name=partner_name)
+                partner_data = processor.map_port_costs(self._get_port_costs(file_name, content),
+                                                        sheet_20ft, sheet_40ft, template_index)
+                partners_data['20ft'].append(partner_data['20ft'])
+                partners_data['40ft'].append(partner_data['40ft'])
+                partners.append(processor.partner_name)
+
+            rankings = {}
+            for container_type, container_size in CONTAINER_TYPES:
+                sheet_index = template_index.report_sheet(area_config[container_size]['report_sheet'])
+                rankings[container_type] = self.report_generator.rank_partners(partners_data[container_type], sheet_index,
+                                                                               area_config.get('top_k', 4))
+
+        return QuotationResult(area, partners, rankings)
\ No newline at end of file
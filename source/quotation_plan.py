@@ -0,0 +1,217 @@
+import os
+import re
+import struct
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Only standard library and yaml here: the plan command must not pay for pandas/openpyxl imports
+from config_manager import ConfigManager
+
+
+AREAS = ['area1', 'area2']
+BRT_BUNDLE_SH = 156
+
+
+def determine_file_area(filename: str, area1_suffix: str, area2_suffix: str) -> Optional[str]:
+    filename_lower = filename.lower()
+    if (filename_lower.endswith(area1_suffix + '.xls') or
+        filename.endswith(area1_suffix + '.xlsx') or
+        filename.endswith(area1_suffix + '.xlsb')):
+        return 'area1'
+    elif (filename_lower.endswith(area2_suffix + '.xls') or
+          filename.endswith(area2_suffix + '.xlsx') or
+          filename.endswith(area2_suffix + '.xlsb')):
+        return 'area2'
+    return None
+
+
+def classify_input_file(config: Dict[str, Any], input_file: str, areas: List[str]) -> Tuple[Optional[str], str]:
+    # Skip Excel lock files of workbooks that are still open or being copied
+    if input_file.startswith('~$'):
+        return None, 'Excel lock file'
+
+    area = determine_file_area(input_file, config['quotation']['area1']['suffix'],
+                               config['quotation']['area2']['suffix'])
+    if area is None:
+        return None, 'no area suffix'
+    if area not in areas or not config['quotation'][area].get('process', False):
+        return None, f"{area} is not processed"
+    return area, ''
+
+
+def collect_tasks(config: Dict[str, Any], input_files: List[str], areas: List[str]) -> List[Tuple[str, str]]:
+    tasks = []
+    for input_file in input_files:
+        area, _ = classify_input_file(config, input_file, areas)
+        if area:
+            tasks.append((input_file, area))
+    return tasks
+
+
+def generate_report_filename(area: str, report_tag: Optional[str] = None) -> str:
+    area_num = area.replace('area', '')
+    if report_tag:
+        tag = re.sub(r'[^\w-]+', '_', report_tag).strip('_').upper()
+        return f"QUOTATION_{tag}_AREA_{area_num}.XLSX"
+
+    now = datetime.now()
+    month = now.strftime("%B").upper()
+    year = now.strftime("%y")
+    return f"QUOTATION_{month}_{year}_AREA_{area_num}.XLSX"
+
+
+def check_environment(config: Dict[str, Any]) -> List[str]:
+    errors = []
+    input_path = config['quotation']['input_path']
+    output_path = config['report']['output_path']
+    template_path = config['report']['template_path']
+
+    if not os.path.exists(input_path):
+        errors.append(f"Input file path '{input_path}' not found")
+    if not os.path.exists(output_path):
+        errors.append(f"Output file path '{output_path}' not found")
+    if not os.path.exists(template_path):
+        errors.append(f"Template file path '{template_path}' not found")
+        return errors
+
+    for area in AREAS:
+        if config['quotation'][area].get('process', False):
+            template_file = os.path.join(template_path, config['report'][area]['template_file'])
+            if not os.path.exists(template_file):
+                errors.append(f"Template file '{template_file}' not found")
+
+    return errors
+
+
+def _read_xlsx_sheet_names(file_path: str) -> List[str]:
+    with zipfile.ZipFile(file_path) as package:
+        root = ET.fromstring(package.read('xl/workbook.xml'))
+    return [element.get('name') for element in root.iter() if element.tag.rsplit('}', 1)[-1] == 'sheet']
+
+
+def _read_varint(data: bytes, pos: int, max_bytes: int) -> Tuple[int, int]:
+    value = 0
+    for shift in range(max_bytes):
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << (7 * shift)
+        if not byte & 0x80:
+            break
+    return value, pos
+
+
+def _read_xlsb_sheet_names(file_path: str) -> List[str]:
+    with zipfile.ZipFile(file_path) as package:
+        data = package.read('xl/workbook.bin')
+
+    names = []
+    pos = 0
+    while pos < len(data):
+        record_type, pos = _read_varint(data, pos, 2)
+        size, pos = _read_varint(data, pos, 4)
+        if record_type == BRT_BUNDLE_SH:
+            # hsState, iTabID, strRelID (nullable wide string), strName (wide string)
+            offset = pos + 8
+            rel_chars = struct.unpack_from('<I', data, offset)[0]
+            offset += 4 + (0 if rel_chars == 0xFFFFFFFF else rel_chars * 2)
+            name_chars = struct.unpack_from('<I', data, offset)[0]
+            names.append(data[offset + 4:offset + 4 + name_chars * 2].decode('utf-16-le'))
+        pos += size
+    return names
+
+
+def read_sheet_names(file_path: str) -> List[str]:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.xlsb':
+        return _read_xlsb_sheet_names(file_path)
+    if extension == '.xls' and not zipfile.is_zipfile(file_path):
+        import xlrd
+        with xlrd.open_workbook(file_path, on_demand=True) as workbook:
+            return workbook.sheet_names()
+    return _read_xlsx_sheet_names(file_path)
+
+
+def build_plan(config: Dict[str, Any], areas: Optional[List[str]] = None) -> Dict[str, Any]:
+    areas = areas or AREAS
+    plan = {
+        'errors': check_environment(config),
+        'areas': {},
+        'skipped': []
+    }
+    input_path = config['quotation']['input_path']
+    if not os.path.isdir(input_path):
+        return plan
+
+    input_sheet = str(config['quotation']['input_sheet'])
+    for area in areas:
+        if config['quotation'][area].get('process', False):
+            plan['areas'][area] = {
+                'template_file': os.path.join(config['report']['template_path'], config['report'][area]['template_file']),
+                'report_file': os.path.join(config['report']['output_path'], generate_report_filename(area)),
+                'files': []
+            }
+
+    for input_file in sorted(os.listdir(input_path)):
+        area, reason = classify_input_file(config, input_file, areas)
+        if area is None:
+            plan['skipped'].append((input_file, reason))
+            continue
+
+        try:
+            sheets = read_sheet_names(os.path.join(input_path, input_file))
+            error = None if input_sheet in sheets else f"sheet '{input_sheet}' not found (sheets: {', '.join(sheets)})"
+        except Exception as e:
+            error = f"cannot read workbook: {e}"
+
+        partner = input_file[:(input_file.find('.') - 1)]
+        plan['areas'][area]['files'].append((input_file, partner, error))
+        if error:
+            plan['errors'].append(f"{input_file}: {error}")
+
+    return plan
+
+
+def print_plan(config_path: str, config: Dict[str, Any], plan: Dict[str, Any]) -> None:
+    quotation = config['quotation']
+    report = config['report']
+    cache = quotation.get('cache', {})
+
+    print(f"Configuration: {config_path}")
+    print(f"Input:  {quotation['input_path']} (sheet '{quotation['input_sheet']}')")
+    print(f"Output: {report['output_path']}")
+    print(f"Mode:   {'pipeline' if report.get('pipeline', False) else 'per sheet'}, "
+          f"writer {report.get('writer', 'openpyxl')}, workers {quotation.get('workers', 1)}, "
+          f"cache {'on' if cache.get('enabled', False) else 'off'}")
+
+    for area, area_plan in plan['areas'].items():
+        print(f"\n{area}: {area_plan['template_file']} -> {area_plan['report_file']}")
+        if not area_plan['files']:
+            print("  no partner files")
+        for input_file, partner, error in area_plan['files']:
+            print(f"  {input_file:<30} partner {partner:<20} {error or 'ok'}")
+
+    if plan['skipped']:
+        print("\nSkipped:")
+        for input_file, reason in plan['skipped']:
+            print(f"  {input_file:<30} {reason}")
+
+    if plan['errors']:
+        print("\nErrors:")
+        for error in plan['errors']:
+            print(f"  {error}")
+
+    files = sum(len(area_plan['files']) for area_plan in plan['areas'].values())
+    print(f"\nPlan: {files} partner files in {len(plan['areas'])} areas, {len(plan['errors'])} errors")
+
+
+def run_plan(config_path: str) -> int:
+    config, err = ConfigManager(config_path).load_config()
+    if err:
+        print(f"File configuration '{config_path}' cannot be loaded: {err}")
+        return 1
+
+    plan = build_plan(config)
+    print_plan(config_path, config, plan)
+    return 1 if plan['errors'] else 0
\ No newline at end of file
@@ -0,0 +1,481 @@
+import os
+import io
+import re
+import json
+import copy
+import uuid
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from http import HTTPStatus
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, quote, unquote
+
+from config_manager import ConfigManager
+from quotation_app import QuotationApp
+from quotation_plan import AREAS, determine_file_area, collect_tasks, generate_report_filename
+
+
+CHUNK_SIZE = 1024 * 1024
+MAX_JSON_BYTES = 64 * 1024
+REQUEST_TIMEOUT = 60
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _content_disposition(file_name: str) -> str:
+    # Headers are latin-1, so non-ASCII names go in filename* (RFC 6266) with an ASCII filename for old clients
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', '_', file_name)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name, safe='')}"
+
+
+def _warm_worker(_: int = 0) -> int:
+    # Runs once in every pool process at startup so the first job does not pay for the fork
+    return os.getpid()
+
+
+class HttpError(Exception):
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class HttpRequest:
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], reader: asyncio.StreamReader):
+        self.method = method
+        self.path = path
+        self.parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        self.headers = headers
+        self.reader = reader
+
+    @property
+    def content_length(self) -> int:
+        if 'chunked' in self.headers.get('transfer-encoding', '').lower():
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Chunked uploads are not supported, send Content-Length")
+        try:
+            return int(self.headers.get('content-length', '0'))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+
+    async def json(self) -> Dict[str, Any]:
+        length = self.content_length
+        if length > MAX_JSON_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body is too large")
+        body = await self.reader.readexactly(length) if length else b''
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return data
+
+
+class ServiceJob:
+
+    def __init__(self, area: str, tag: Optional[str], job_path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.area = area
+        self.tag = tag
+        self.job_path = os.path.join(job_path, self.id)
+        self.status = 'queued'
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.files: List[str] = []
+        self.report_file: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    @property
+    def matrix_path(self) -> Optional[str]:
+        return f"{self.report_file}.matrix" if self.report_file else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at and self.finished_at:
+            duration = round((self.finished_at - self.started_at).total_seconds(), 3)
+
+        has_report = self.report_file is not None and os.path.exists(self.report_file)
+        return {
+            'id': self.id,
+            'area': self.area,
+            'tag': self.tag,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(timespec='seconds'),
+            'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+            'finished_at': self.finished_at.isoformat(timespec='seconds') if self.finished_at else None,
+            'duration_s': duration,
+            'files': self.files,
+            'report': f"/jobs/{self.id}/report" if has_report else None,
+            'matrix': f"/jobs/{self.id}/matrix" if has_report and os.path.isdir(self.matrix_path) else None,
+            'error': self.error
+        }
+
+
+class QuotationService:
+
+    def __init__(self, config_path: str = 'config.yaml', host: Optional[str] = None, port: Optional[int] = None,
+                 workers: Optional[int] = None):
+        config, err = ConfigManager(config_path).load_config()
+        if err:
+            raise ValueError(f"File configuration '{config_path}' cannot be loaded: {err}")
+
+        service_config = config.get('service', {})
+        self.config_path = config_path
+        self.config = config
+        self.host = host or service_config.get('host', '127.0.0.1')
+        self.port = port if port is not None else service_config.get('port', 8080)
+        self.workspace = service_config.get('workspace', 'service')
+        self.input_path = os.path.join(self.workspace, 'inputs')
+        self.job_path = os.path.join(self.workspace, 'jobs')
+        self.max_upload_bytes = int(service_config.get('max_upload_mb', 100) * 1024 * 1024)
+        self.keep_jobs = service_config.get('keep_jobs', 50)
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+
+        self.jobs: OrderedDict = OrderedDict()
+        self.queue: Optional[asyncio.Queue] = None
+        self.template_cache = {}
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Jobs run one at a time next to the event loop, their partner files are parsed by the process pool
+        self.job_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='quotation-job')
+
+    def _job_config(self, area: Optional[str] = None, output_path: Optional[str] = None) -> Dict[str, Any]:
+        config = copy.deepcopy(self.config)
+        config['quotation']['input_path'] = self.input_path
+        config['report']['pipeline'] = True
+        config['report']['parallel_areas'] = False
+        # The matrix is one of the job downloads
+        config['report']['export_matrix'] = True
+        if output_path:
+            config['report']['output_path'] = output_path
+        for name in AREAS:
+            config['quotation'][name]['process'] = area is None or name == area
+        return config
+
+    def _create_app(self, config: Dict[str, Any], areas: List[str], report_tag: Optional[str] = None) -> QuotationApp:
+        return QuotationApp(self.config_path, workers=self.workers, pipeline=True, parallel_areas=False, areas=areas,
+                            show_progress=False, report_tag=report_tag, executor=self.executor,
+                            template_cache=self.template_cache, config=config)
+
+    def _start_pool(self) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        list(self.executor.map(_warm_worker, range(self.workers)))
+        self.logger.info(f"{datetime.now()}: Service worker pool started with {self.workers} processes")
+
+    def _ensure_pool(self) -> None:
+        try:
+            self.executor.submit(_warm_worker).result()
+        except BrokenProcessPool:
+            self.logger.error(f"{datetime.now()}: Service worker pool is broken, restarting it")
+            self.executor.shutdown(wait=False)
+            self._start_pool()
+
+    def warm_up(self) -> None:
+        os.makedirs(self.input_path, exist_ok=True)
+        os.makedirs(self.job_path, exist_ok=True)
+
+        app = self._create_app(self._job_config(), AREAS)
+        self.workers = app.workers
+        self._start_pool()
+        # Parsed templates are shared by every job through template_cache
+        try:
+            app.load_templates()
+        except Exception as e:
+            self.logger.error(f"{datetime.now()}: Templates cannot be loaded: {str(e)}")
+
+    def _build_area(self, job: ServiceJob) -> None:
+        self._ensure_pool()
+        os.makedirs(job.job_path, exist_ok=True)
+        app = self._create_app(self._job_config(job.area, job.job_path), [job.area], job.tag)
+
+        job.files = [input_file for input_file, _ in collect_tasks(app.config, sorted(os.listdir(self.input_path)),
+                                                                   [job.area])]
+        if not job.files:
+            raise ValueError(f"No partner files of {job.area} have been uploaded")
+
+        job.report_file = os.path.join(job.job_path, generate_report_filename(job.area, job.tag))
+        with app.metrics.stage('service_job', job=job.id, area=job.area, files=len(job.files)):
+            if not app.process_quotations():
+                raise ValueError("Quotation has been processed fail, please check error in log file")
+            if not app.generate_best_prices():
+                raise ValueError("Best price list has been processed fail, please check error in log file")
+
+    async def _run_jobs(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = 'running'
+            job.started_at = datetime.now()
+            try:
+                await loop.run_in_executor(self.job_thread, self._build_area, job)
+                job.status = 'done'
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+                self.logger.error(f"{datetime.now()}: Service job {job.id} of {job.area} error: {str(e)}")
+            finally:
+                job.finished_at = datetime.now()
+                self.queue.task_done()
+            self._prune_jobs()
+
+    def _prune_jobs(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job.id]
+            shutil.rmtree(job.job_path, ignore_errors=True)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> HttpRequest:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+        except asyncio.LimitOverrunError:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers are too large")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid request line")
+
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return HttpRequest(method.upper(), urlsplit(target).path, headers, reader)
+
+    async def _send(self, writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes,
+                    content_type: str = 'application/json', headers: Optional[Dict[str, str]] = None) -> None:
+        head = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: HTTPStatus, data: Any) -> None:
+        await self._send(writer, status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    async def _send_file(self, writer: asyncio.StreamWriter, file_path: str, content_type: str) -> None:
+        head = ["HTTP/1.1 200 OK", f"Content-Type: {content_type}", f"Content-Length: {os.path.getsize(file_path)}",
+                f"Content-Disposition: {_content_disposition(os.path.basename(file_path))}", "Connection: close"]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await self._read_request(reader)
+            await self._dispatch(request, writer)
+        except HttpError as e:
+            await self._send_json(writer, e.status, {'error': str(e)})
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            self.logger.error(f"{datetime.now()}: Service request error: {str(e)}")
+            await self._send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)})
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        parts = request.parts
+        routes = {
+            ('GET', 1, 'health'): self._get_health,
+            ('GET', 1, 'files'): self._list_files,
+            ('PUT', 2, 'files'): self._upload_file,
+            ('DELETE', 2, 'files'): self._delete_file,
+            ('GET', 1, 'jobs'): self._list_jobs,
+            ('POST', 1, 'jobs'): self._create_job,
+            ('GET', 2, 'jobs'): self._get_job,
+            ('GET', 3, 'jobs'): self._download,
+        }
+
+        handler = routes.get((request.method, len(parts), parts[0] if parts else ''))
+        if handler is None:
+            known = any(key[1:] == (len(parts), parts[0] if parts else '') for key in routes)
+            if known:
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"{request.method} is not allowed on {request.path}")
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown path {request.path}")
+        await handler(request, writer)
+
+    async def _get_health(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        await self._send_json(writer, HTTPStatus.OK, {
+            'status': 'ok',
+            'workers': self.workers,
+            'templates': len(self.template_cache),
+            'queued': self.queue.qsize(),
+            'running': sum(job.status == 'running' for job in self.jobs.values())
+        })
+
+    def _file_info(self, file_name: str) -> Dict[str, Any]:
+        stat = os.stat(os.path.join(self.input_path, file_name))
+        return {
+            'file': file_name,
+            'area': determine_file_area(file_name, self.config['quotation']['area1']['suffix'],
+                                        self.config['quotation']['area2']['suffix']),
+            'size': stat.st_size,
+            'modified_at': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds')
+        }
+
+    def _check_file_name(self, file_name: str) -> None:
+        if os.path.basename(file_name) != file_name or file_name.startswith(('.', '~$')):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid file name '{file_name}'")
+        area = determine_file_area(file_name, self.config['quotation']['area1']['suffix'],
+                                   self.config['quotation']['area2']['suffix'])
+        if area is None:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"'{file_name}' has no area suffix")
+
+    async def _list_files(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        files = [self._file_info(file_name) for file_name in sorted(os.listdir(self.input_path))
+                 if not file_name.startswith('.')]
+        await self._send_json(writer, HTTPStatus.OK, {'files': files})
+
+    async def _upload_file(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        file_name = request.parts[1]
+        self._check_file_name(file_name)
+        length = request.content_length
+        if length > self.max_upload_bytes:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"'{file_name}' is larger than the upload limit")
+
+        # Written next to the inputs and renamed into place, so a running job never sees half a file
+        file_path = os.path.join(self.input_path, file_name)
+        tmp_file = os.path.join(self.input_path, f".{file_name}.{uuid.uuid4().hex[:8]}.tmp")
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_file, 'wb') as file:
+                remaining = length
+                while remaining:
+                    chunk = await request.reader.readexactly(min(CHUNK_SIZE, remaining))
+                    digest.update(chunk)
+                    file.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(tmp_file, file_path)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+        info = self._file_info(file_name)
+        info['sha256'] = digest.hexdigest()
+        await self._send_json(writer, HTTPStatus.CREATED, info)
+
+    async def _delete_file(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        file_name = request.parts[1]
+        self._check_file_name(file_name)
+        try:
+            os.remove(os.path.join(self.input_path, file_name))
+        except FileNotFoundError:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"'{file_name}' has not been uploaded")
+        await self._send_json(writer, HTTPStatus.OK, {'file': file_name, 'deleted': True})
+
+    async def _list_jobs(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        await self._send_json(writer, HTTPStatus.OK, {'jobs': [job.to_dict() for job in self.jobs.values()]})
+
+    async def _create_job(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        data = await request.json()
+        area = data.get('area')
+        if area not in AREAS:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"'area' must be one of {', '.join(AREAS)}")
+        tag = data.get('tag')
+        if tag is not None and not isinstance(tag, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "'tag' must be a string")
+
+        job = ServiceJob(area, tag, self.job_path)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        await self._send_json(writer, HTTPStatus.ACCEPTED, job.to_dict())
+
+    def _find_job(self, job_id: str) -> ServiceJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown job '{job_id}'")
+        return job
+
+    async def _get_job(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        await self._send_json(writer, HTTPStatus.OK, self._find_job(request.parts[1]).to_dict())
+
+    def _pack_matrix(self, matrix_path: str) -> bytes:
+        # A zip of .npy files is an .npz archive, numpy.load reads it as is
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as package:
+            for file_name in sorted(os.listdir(matrix_path)):
+                package.write(os.path.join(matrix_path, file_name), file_name)
+        return buffer.getvalue()
+
+    async def _download(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        job = self._find_job(request.parts[1])
+        download = request.parts[2]
+        if download not in ('report', 'matrix'):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown path {request.path}")
+        if not job.finished:
+            raise HttpError(HTTPStatus.CONFLICT, f"Job '{job.id}' is {job.status}")
+        if job.report_file is None or not os.path.exists(job.report_file):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Job '{job.id}' has no report")
+
+        if download == 'report':
+            await self._send_file(writer, job.report_file, XLSX_CONTENT_TYPE)
+            return
+
+        if not os.path.isdir(job.matrix_path):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Job '{job.id}' has no matrix")
+        body = await asyncio.get_running_loop().run_in_executor(None, self._pack_matrix, job.matrix_path)
+        file_name = os.path.basename(job.report_file) + '.matrix.npz'
+        await self._send(writer, HTTPStatus.OK, body, 'application/zip',
+                         {'Content-Disposition': _content_disposition(file_name)})
+
+    async def serve(self) -> None:
+        self.queue = asyncio.Queue()
+        start = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(self.job_thread, self.warm_up)
+
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving quotation jobs on http://{host}:{port} with {self.workers} workers "
+              f"(ready in {time.perf_counter() - start:.1f}s), press Ctrl+C to stop", flush=True)
+        self.logger.info(f"{datetime.now()}: Service listening on {host}:{port}")
+
+        runner = asyncio.create_task(self._run_jobs())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            runner.cancel()
+
+    def close(self) -> None:
+        self.job_thread.shutdown(wait=True, cancel_futures=True)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def run_service(config_path: str, host: Optional[str] = None, port: Optional[int] = None,
+                workers: Optional[int] = None) -> int:
+    try:
+        service = QuotationService(config_path, host, port, workers)
+    except ValueError as e:
+        print(str(e))
+        return 1
+
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
\ No newline at end of file
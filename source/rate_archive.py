@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import math
+import uuid
+import hashlib
+import numpy as np
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+
+ARCHIVE_VERSION = 2
+CONTAINER_TYPES = ['20ft', '40ft']
+INDEX_FILE = 'index.json'
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^\w-]+', '_', name).strip('_')
+
+
+def _content_hash(pods: np.ndarray, costs: np.ndarray) -> str:
+    digest = hashlib.sha256('\n'.join(pods.tolist()).encode('utf-8'))
+    digest.update(np.ascontiguousarray(costs, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _partner_keys(partners: List[str]) -> List[str]:
+    # A partner name used twice in one area is told apart by its position among the files of that name
+    seen = {}
+    keys = []
+    for partner in partners:
+        seen[partner] = seen.get(partner, 0) + 1
+        keys.append(partner if seen[partner] == 1 else f"{partner}#{seen[partner]}")
+    return keys
+
+
+class RateArchive:
+    """Append-only store of per-partner POD costs, one <period>/<area>/<container>/<run>.npz segment per run."""
+
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+
+    def _segment_name(self, run_time: datetime, report_tag: Optional[str]) -> str:
+        name = f"{run_time:%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+        if report_tag:
+            name += '_' + _safe_name(report_tag)
+        return name + '.npz'
+
+    def _segment_path(self, period: str, area: str, container_type: str) -> str:
+        return os.path.join(self.archive_path, _safe_name(period) or '_', area, container_type)
+
+    def _build_index(self, segment_path: str, segment_names: List[str]) -> Dict[str, Any]:
+        # Rebuilt from the segments when index.json is missing or misses a segment, e.g. after an interrupted run
+        index = {'version': ARCHIVE_VERSION, 'segments': [], 'pods': {}, 'latest': {}}
+        for segment_name in segment_names:
+            with np.load(os.path.join(segment_path, segment_name), allow_pickle=False) as segment:
+                if int(segment['version']) != ARCHIVE_VERSION:
+                    continue
+                pods = np.repeat(segment['pods'], np.diff(segment['offsets']))
+                self._add_to_index(index, segment_name, segment['pods'], segment['partner_keys'].tolist(),
+                                   segment['partner'], pods, segment['cost'])
+        return index
+
+    def _add_to_index(self, index: Dict[str, Any], segment_name: str, index_pods: np.ndarray, keys: List[str],
+                      partner_ids: np.ndarray, pods: np.ndarray, costs: np.ndarray) -> None:
+        position = len(index['segments'])
+        index['segments'].append(segment_name)
+        for pod in index_pods.tolist():
+            index['pods'].setdefault(pod, []).append(position)
+        for partner_id, key in enumerate(keys):
+            rows = partner_ids == partner_id
+            index['latest'][key] = _content_hash(pods[rows], costs[rows])
+
+    def _load_index(self, segment_path: str) -> Dict[str, Any]:
+        segment_names = sorted(name for name in os.listdir(segment_path) if name.endswith('.npz'))
+        try:
+            with open(os.path.join(segment_path, INDEX_FILE), 'r', encoding='utf-8') as file:
+                index = json.load(file)
+            if index.get('version') == ARCHIVE_VERSION and sorted(index['segments']) == segment_names:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._build_index(segment_path, segment_names)
+
+    def _save_index(self, segment_path: str, index: Dict[str, Any]) -> None:
+        index_file = os.path.join(segment_path, INDEX_FILE)
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump(index, file, ensure_ascii=False)
+        os.replace(tmp_file, index_file)
+
+    def append(self, area: str, partners_data: Dict[str, List[Dict[str, Any]]], pod_names: Dict[str, np.ndarray],
+               period: str, run_time: Optional[datetime] = None, report_tag: Optional[str] = None) -> List[str]:
+        run_time = run_time or datetime.now()
+        segment_name = self._segment_name(run_time, report_tag)
+        segment_files = []
+
+        for container_type in CONTAINER_TYPES:
+            partners_list = partners_data.get(container_type) or []
+            if not partners_list:
+                continue
+
+            pods, partner_ids, costs = [], [], []
+            for partner_id, partner_info in enumerate(partners_list):
+                for pod, cost in zip(pod_names[container_type].tolist(), partner_info['costs'].tolist()):
+                    if not math.isnan(cost):
+                        pods.append(pod)
+                        partner_ids.append(partner_id)
+                        costs.append(cost)
+
+            # Rows sorted by POD with the offsets of every POD, so a lookup is one binary search
+            pods = np.array(pods, dtype=str)
+            partner_ids = np.array(partner_ids, dtype=np.int32)
+            costs = np.array(costs, dtype=np.float64)
+            order = np.lexsort((partner_ids, pods))
+            pods, partner_ids, costs = pods[order], partner_ids[order], costs[order]
+
+            segment_path = self._segment_path(period, area, container_type)
+            os.makedirs(segment_path, exist_ok=True)
+            index = self._load_index(segment_path)
+
+            # Partners whose costs are unchanged since their last archived run of the period are not archived again
+            partners = [str(partner_info['partner']) for partner_info in partners_list]
+            keys = _partner_keys(partners)
+            changed = []
+            for partner_id, key in enumerate(keys):
+                rows = partner_ids == partner_id
+                if index['latest'].get(key) != _content_hash(pods[rows], costs[rows]):
+                    changed.append(partner_id)
+            if not changed:
+                continue
+
+            keep = np.isin(partner_ids, changed)
+            pods, costs = pods[keep], costs[keep]
+            partner_ids = np.searchsorted(np.array(changed), partner_ids[keep]).astype(np.int32)
+            partners = [partners[partner_id] for partner_id in changed]
+            keys = [keys[partner_id] for partner_id in changed]
+            index_pods, offsets = np.unique(pods, return_index=True)
+
+            segment_file = os.path.join(segment_path, segment_name)
+            tmp_file = f"{segment_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'wb') as file:
+                np.savez(file,
+                         version=np.array(ARCHIVE_VERSION),
+                         run_time=np.array(run_time.isoformat(timespec='seconds')),
+                         period=np.array(period),
+                         report_tag=np.array(report_tag or ''),
+                         pods=index_pods,
+                         offsets=np.append(offsets, len(pods)).astype(np.int64),
+                         partners=np.array(partners, dtype=str),
+                         partner_keys=np.array(keys, dtype=str),
+                         partner=partner_ids,
+                         cost=costs)
+            os.replace(tmp_file, segment_file)
+
+            self._add_to_index(index, segment_name, index_pods, keys, partner_ids, pods, costs)
+            self._save_index(segment_path, index)
+            segment_files.append(segment_file)
+
+        return segment_files
+
+    def _iter_segment_paths(self, area: Optional[str], container_type: Optional[str],
+                            periods: Optional[List[str]]):
+        if not os.path.isdir(self.archive_path):
+            return
+
+        period_names = {_safe_name(period) or '_' for period in periods} if periods else None
+        for period in sorted(os.listdir(self.archive_path)):
+            if period_names and period not in period_names:
+                continue
+            period_path = os.path.join(self.archive_path, period)
+            if not os.path.isdir(period_path):
+                continue
+
+            for area_name in sorted(os.listdir(period_path)):
+                if area and area_name != area:
+                    continue
+                for container_name in CONTAINER_TYPES:
+                    if container_type and container_name != container_type:
+                        continue
+                    segment_path = os.path.join(period_path, area_name, container_name)
+                    if os.path.isdir(segment_path):
+                        yield area_name, container_name, segment_path
+
+    def history(self, pod: str, area: Optional[str] = None, container_type: Optional[str] = None,
+                partner: Optional[str] = None, periods: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        pod = pod.upper()
+        records = []
+
+        for area_name, container_name, segment_path in self._iter_segment_paths(area, container_type, periods):
+            # The index names the segments holding the POD, the others are not opened
+            index = self._load_index(segment_path)
+            for position in index['pods'].get(pod, []):
+                with np.load(os.path.join(segment_path, index['segments'][position]), allow_pickle=False) as segment:
+                    pods = segment['pods']
+                    pos = np.searchsorted(pods, pod)
+                    if pos >= len(pods) or pods[pos] != pod:
+                        continue
+
+                    offsets = segment['offsets']
+                    rows = slice(int(offsets[pos]), int(offsets[pos + 1]))
+                    partners = segment['partners']
+                    run_time = str(segment['run_time'])
+                    period = str(segment['period'])
+                    report_tag = str(segment['report_tag'])
+
+                    for partner_id, cost in zip(segment['partner'][rows].tolist(), segment['cost'][rows].tolist()):
+                        partner_name = str(partners[partner_id])
+                        if partner and partner_name.upper() != partner.upper():
+                            continue
+                        records.append({
+                            'period': period,
+                            'run_time': run_time,
+                            'report_tag': report_tag,
+                            'area': area_name,
+                            'container': container_name,
+                            'partner': partner_name,
+                            'cost': cost
+                        })
+
+        records.sort(key=lambda record: (record['run_time'], record['area'], record['container'], record['cost']))
+        return records
+
+
+def print_history(pod: str, records: List[Dict[str, Any]]) -> None:
+    if not records:
+        print(f"No archived rates for '{pod}'")
+        return
+
+    print(f"{'RUN':<20} {'PERIOD':<10} {'AREA':<6} {'TYPE':<5} {'PARTNER':<20} {'COST':>10}  REPORT")
+    for record in records:
+        print(f"{record['run_time']:<20} {record['period']:<10} {record['area']:<6} {record['container']:<5} "
+              f"{record['partner']:<20} {record['cost']:>10.2f}  {record['report_tag']}")
+
+    runs = len({(record['run_time'], record['report_tag']) for record in records})
+    print(f"\n{len(records)} rates of '{pod.upper()}' in {runs} runs")
+
+
+def run_history(config_path: str, pod: str, area: Optional[str] = None, container_type: Optional[str] = None,
+                partner: Optional[str] = None, periods: Optional[List[str]] = None) -> int:
+    from config_manager import ConfigManager
+
+    config, err = ConfigManager(config_path).load_config()
+    if err:
+        print(f"File configuration '{config_path}' cannot be loaded: {err}")
+        return 1
+
+    archive = RateArchive(config.get('archive', {}).get('path', 'archive'))
+    print_history(pod, archive.history(pod, area, container_type, partner, periods))
+    return 0
\ No newline at end of file
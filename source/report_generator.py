@@ -1,24 +1,66 @@
+import os
 import math
+import logging
+import numbers
+import numpy as np
 import pandas as pd
 import openpyxl as opxl
 import openpyxl.utils
-from typing import Dict, Any, List
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from template_index import TemplateIndex, ReportSheetIndex, BestPricesSheetIndex, build_template_index
+from xlsx_patch_writer import PatchWorkbook, PatchWorksheet, PatchCell
+from run_metrics import RunMetrics
+from matrix_export import BestPricesRanking, MatrixExport
+
+
+logger = logging.getLogger(__name__)
 
 
 class ReportGenerator:
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], metrics: Optional[RunMetrics] = None):
         self.config = config
+        self.metrics = metrics or RunMetrics()
+        self.export_matrix = config['report'].get('export_matrix', False)
+    
+    def _open_workbook(self, file: str):
+        with self.metrics.stage('load', file=os.path.basename(file)):
+            if self.config['report'].get('writer', 'openpyxl') == 'patch':
+                return PatchWorkbook(file)
+            return opxl.load_workbook(file)
+    
+    def _save_workbook(self, workbook, file: str) -> None:
+        with self.metrics.stage('save', file=os.path.basename(file)):
+            workbook.save(file)
     
-    def write_all_partners_data(self, partners_data: Dict[str, List], output_file: str) -> None:
+    def write_all_partners_data(self, partners_data: Dict[str, List], output_file: str,
+                                template_index: Optional[TemplateIndex] = None) -> None:
+        sheets = {}
         for container_type in ['20ft', '40ft']:
             if partners_data[container_type]:
-                sheet_name = partners_data[container_type][0]['sheet']
-                self._write_partners_to_sheet(partners_data[container_type], output_file, sheet_name, 3)
+                sheets[container_type] = partners_data[container_type][0]['sheet']
+        
+        if template_index is None:
+            template_index = TemplateIndex(output_file, list(sheets.values()))
+        
+        for container_type, sheet_name in sheets.items():
+            self._write_partners_to_sheet(partners_data[container_type], output_file, sheet_name, 
+                                          template_index.report_sheet(sheet_name))
     
-    def _copy_cell_formatting(self, source_cell, target_cell) -> None:
+    def _get_header_style(self, source_cell):
+        if isinstance(source_cell, PatchCell):
+            return source_cell.style_id
+        
+        workbook = source_cell.parent.parent
+        name = f"Partner Header {source_cell.style_id}"
+        if name in workbook.named_styles:
+            return name
+        
+        header_style = opxl.styles.NamedStyle(name=name)
         if source_cell.font:
-            target_cell.font = opxl.styles.Font(
+            header_style.font = opxl.styles.Font(
                 name=source_cell.font.name,
                 size=source_cell.font.size,
                 bold=source_cell.font.bold,
@@ -27,14 +69,14 @@ class ReportGenerator:
             )
         
         if source_cell.fill:
-            target_cell.fill = opxl.styles.PatternFill(
+            header_style.fill = opxl.styles.PatternFill(
                 fill_type=source_cell.fill.fill_type,
                 start_color=source_cell.fill.start_color,
                 end_color=source_cell.fill.end_color
             )
         
         if source_cell.border:
-            target_cell.border = opxl.styles.Border(
+            header_style.border = opxl.styles.Border(
                 left=source_cell.border.left,
                 right=source_cell.border.right,
                 top=source_cell.border.top,
@@ -42,11 +84,28 @@ class ReportGenerator:
             )
         
         if source_cell.alignment:
-            target_cell.alignment = opxl.styles.Alignment(
+            header_style.alignment = opxl.styles.Alignment(
                 horizontal=source_cell.alignment.horizontal,
                 vertical=source_cell.alignment.vertical,
                 wrap_text=source_cell.alignment.wrap_text
             )
+        
+        workbook.add_named_style(header_style)
+        return name
+    
+    def _apply_header_style(self, target_cell, header_style) -> None:
+        if isinstance(target_cell, PatchCell):
+            target_cell.style_id = header_style
+        else:
+            target_cell.style = header_style
+
+    def _write_column(self, worksheet, column: int, rows: np.ndarray, values: np.ndarray) -> None:
+        if isinstance(worksheet, PatchWorksheet):
+            worksheet.write_column(column, rows.tolist(), values.tolist())
+            return
+        
+        for row, value in zip(rows.tolist(), values.tolist()):
+            worksheet.cell(row=row, column=column, value=value)
 
     def _set_column_widths(self, worksheet, start_col: int, partner_count: int) -> None:
         worksheet.column_dimensions['A'].width = 25
@@ -63,56 +122,60 @@ class ReportGenerator:
             col_letter = opxl.utils.get_column_letter(col_idx)
             worksheet.column_dimensions[col_letter].width = 18
 
-    def _write_partners_to_sheet(self, partners_list: List[Dict], file: str, sheet: str, skip: int) -> None:
-        workbook = opxl.load_workbook(file)
-        worksheet = workbook[sheet]
-        
-        df = pd.read_excel(file, sheet_name=sheet, skiprows=skip)
-        
-        try:
-            pod_col_idx = df.columns.get_loc('POD')
-        except KeyError:
-            pod_col_idx = 0
-        
+    def _write_partners_to_sheet(self, partners_list: List[Dict], file: str, sheet: str, 
+                                 sheet_index: ReportSheetIndex) -> None:
+        workbook = self._open_workbook(file)
+        with self.metrics.stage('partner_columns', file=os.path.basename(file), sheet=sheet):
+            self._fill_partner_columns(workbook[sheet], partners_list, sheet_index)
+        self._save_workbook(workbook, file)
+    
+    def _fill_partner_columns(self, worksheet, partners_list: List[Dict], sheet_index: ReportSheetIndex,
+                              start_idx: int = 0) -> None:
+        pod_col_idx = sheet_index.pod_col_idx
         start_col = pod_col_idx + 1
-        header_row_pos = skip + 1
-        pod_header_cell = worksheet.cell(row=header_row_pos, column=pod_col_idx + 1)
+        header_row_pos = sheet_index.header_row
+        header_style = self._get_header_style(worksheet.cell(row=header_row_pos, column=pod_col_idx + 1))
         
-        for partner_idx, partner_info in enumerate(partners_list):
-            partner_name = partner_info['partner']
-            partner_data = partner_info['data']
-            
+        for partner_idx, partner_info in enumerate(partners_list, start_idx):
             col_pos = start_col + partner_idx + 1
             
             partner_cell_1 = worksheet.cell(row=header_row_pos, column=col_pos)
-            partner_cell_1.value = partner_name
+            partner_cell_1.value = partner_info['partner']
+            self._apply_header_style(partner_cell_1, header_style)
             
-            self._copy_cell_formatting(pod_header_cell, partner_cell_1)
-            
-            cost_mapping = dict(zip(partner_data['POD'], partner_data['COST']))
-            
-            for row in range(len(df)):
-                pod = df.iloc[row]['POD']
-                if pod in cost_mapping:
-                    cost = cost_mapping[pod]
-                    if not pd.isna(cost):
-                        worksheet.cell(row=row + header_row_pos + 1, column=col_pos).value = cost
+            costs = sheet_index.row_costs(partner_info['costs'])
+            rows = np.flatnonzero(~np.isnan(costs))
+            self._write_column(worksheet, col_pos, rows + header_row_pos + 1, costs[rows])
         
-        self._set_column_widths(worksheet, start_col + 1, len(partners_list))
-        workbook.save(file)
+        self._set_column_widths(worksheet, start_col + 1, start_idx + len(partners_list))
+    
+    def _restore_partner_column(self, worksheet, partner_idx: int, sheet_index: ReportSheetIndex) -> None:
+        frame = sheet_index.frame
+        col_idx = sheet_index.pod_col_idx + partner_idx + 1
+        col_pos = col_idx + 1
+        
+        for row in range(len(sheet_index.pods)):
+            value = frame.iat[row, col_idx] if col_idx < len(frame.columns) else None
+            if pd.isna(value):
+                value = None
+            worksheet.cell(row=row + sheet_index.header_row + 1, column=col_pos).value = value
     
     def write_forwarder_data_to_file(self, forwarder_data: Dict[str, Any], output_file: str) -> None:
+        sheets = [forwarder_data[container_type]['sheet'] for container_type in ['20ft', '40ft']]
+        template_index = TemplateIndex(output_file, sheets)
+        
         for container_type in ['20ft', '40ft']:
             data_info = forwarder_data[container_type]
             partners_list = [{
                 'partner': data_info['partner'],
-                'data': data_info['data']
+                'costs': data_info['costs']
             }]
-            self._write_partners_to_sheet(partners_list, output_file, data_info['sheet'], 3)
+            self._write_partners_to_sheet(partners_list, output_file, data_info['sheet'], 
+                                          template_index.report_sheet(data_info['sheet']))
 
     def _write_single_forwarder_data(self, fwd_idx: int, fwd_data: pd.DataFrame, 
                                    file: str, sheet: str, skip: int) -> None:
-        workbook = opxl.load_workbook(file)
+        workbook = self._open_workbook(file)
         worksheet = workbook[sheet]
 
         for row in range(1, len(fwd_data) + 1):
@@ -120,58 +183,261 @@ class ReportGenerator:
             if not math.isnan(cost):
                 worksheet.cell(row=row + skip + 1, column=fwd_idx + 1).value = cost
                 
-        workbook.save(file)
+        self._save_workbook(workbook, file)
 
-    def generate_and_write_best_prices(self, report_file: str, area_config: Dict[str, Any]) -> None:
-        for container_size in ['20feet', '40feet']:
+    def write_area_report(self, partners_data: Dict[str, List], report_file: str, 
+                          area_config: Dict[str, Any], template_index: TemplateIndex) -> None:
+        report_name = os.path.basename(report_file)
+        workbook = self._open_workbook(report_file)
+        matrix_export = MatrixExport(report_file) if self.export_matrix else None
+        
+        for container_type, container_size in [('20ft', '20feet'), ('40ft', '40feet')]:
+            container_config = area_config[container_size]
+            report_sheet = container_config['report_sheet']
+            bestprices_sheet = container_config['bestprices_sheet']
+            sheet_index = template_index.report_sheet(report_sheet)
+            partners_list = partners_data[container_type]
+            
+            if partners_list:
+                with self.metrics.stage('partner_columns', file=report_name, sheet=report_sheet):
+                    self._fill_partner_columns(workbook[report_sheet], partners_list, sheet_index)
+            
+            with self.metrics.stage('best_prices', file=report_name, sheet=bestprices_sheet):
+                ranking = self.rank_partners(partners_list, sheet_index, area_config.get('top_k', 4))
+                self._fill_bestprices_sheet(workbook[bestprices_sheet], ranking.to_dict(), 
+                                            template_index.bestprices_sheet(bestprices_sheet), top=ranking.top)
+            
+            if matrix_export is not None:
+                matrix_export.add(container_type, ranking)
+        
+        self._save_workbook(workbook, report_file)
+        self._save_matrix(matrix_export)
+    
+    def update_area_report(self, partners_data: Dict[str, List], previous_data: Dict[str, List],
+                           changed_partners: List[int], report_file: str, area_config: Dict[str, Any], 
+                           template_index: TemplateIndex) -> None:
+        report_name = os.path.basename(report_file)
+        workbook = self._open_workbook(report_file)
+        matrix_export = MatrixExport(report_file) if self.export_matrix else None
+        
+        for container_type, container_size in [('20ft', '20feet'), ('40ft', '40feet')]:
             container_config = area_config[container_size]
             report_sheet = container_config['report_sheet']
             bestprices_sheet = container_config['bestprices_sheet']
+            sheet_index = template_index.report_sheet(report_sheet)
+            partners_list = partners_data[container_type]
+            worksheet = workbook[report_sheet]
             
-            input_data = self._prepare_data_for_bestprices(report_file, report_sheet, 3, 2)
-            best_prices_dict = self._get_best_prices(input_data, 4)
-            self._write_bestprices_report(best_prices_dict, report_file, bestprices_sheet, 4)
+            changed_pods = set()
+            with self.metrics.stage('partner_columns', file=report_name, sheet=report_sheet):
+                for partner_idx in changed_partners:
+                    partner_info = partners_list[partner_idx]
+                    previous_info = None
+                    if partner_idx < len(previous_data[container_type]):
+                        previous_info = previous_data[container_type][partner_idx]
+                    
+                    self._restore_partner_column(worksheet, partner_idx, sheet_index)
+                    self._fill_partner_columns(worksheet, [partner_info], sheet_index, partner_idx)
+                    changed_pods |= self._get_changed_pods(previous_info, partner_info, sheet_index)
+                    if previous_info is None:
+                        changed_pods |= self._get_template_column_pods(partner_idx, sheet_index)
+            
+            if matrix_export is not None:
+                # The exported matrix always covers every POD, not only the re-ranked ones
+                matrix_export.add(container_type, self.rank_partners(partners_list, sheet_index, area_config.get('top_k', 4)))
+            
+            if not changed_pods:
+                continue
+            
+            with self.metrics.stage('best_prices', file=report_name, sheet=bestprices_sheet):
+                input_data = self._build_cost_frame(partners_list, sheet_index).iloc[:, 2:]
+                changed_rows = input_data['POD'].str.upper().isin(changed_pods)
+                input_data = input_data[changed_rows.fillna(False).astype(bool)].reset_index(drop=True)
+                
+                best_prices_dict = self._get_best_prices(input_data, area_config.get('top_k', 4))
+                self._fill_bestprices_sheet(workbook[bestprices_sheet], best_prices_dict, 
+                                            template_index.bestprices_sheet(bestprices_sheet), restore_missing=True,
+                                            top=area_config.get('top_k', 4))
+        
+        self._save_workbook(workbook, report_file)
+        self._save_matrix(matrix_export)
+    
+    def _save_matrix(self, matrix_export: Optional[MatrixExport]) -> None:
+        if matrix_export is None:
+            return
+        with self.metrics.stage('export_matrix', file=os.path.basename(matrix_export.report_file)):
+            matrix_export.save()
+    
+    def _get_changed_pods(self, previous_info: Optional[Dict], partner_info: Dict,
+                          sheet_index: ReportSheetIndex) -> set:
+        costs = partner_info['costs']
+        previous_costs = np.full(len(costs), np.nan)
+        if previous_info is not None:
+            previous_costs = previous_info['costs']
+        
+        changed = (previous_costs != costs) & ~(np.isnan(previous_costs) & np.isnan(costs))
+        return set(sheet_index.pod_names[changed])
+    
+    def _get_template_column_pods(self, partner_idx: int, sheet_index: ReportSheetIndex) -> set:
+        frame = sheet_index.frame
+        col_idx = sheet_index.pod_col_idx + partner_idx + 1
+        if col_idx >= len(frame.columns):
+            return set()
+        
+        filled = frame.iloc[:, col_idx].notna().to_numpy()
+        return set(sheet_index.pod_keys[filled].dropna())
+    
+    def rank_partners(self, partners_list: List[Dict], sheet_index: ReportSheetIndex, top: int = 4) -> BestPricesRanking:
+        input_data = self._build_cost_frame(partners_list, sheet_index).iloc[:, 2:]
+        return self._rank_best_prices(input_data, top)
+    
+    def _build_cost_frame(self, partners_list: List[Dict], sheet_index: ReportSheetIndex) -> pd.DataFrame:
+        frame = sheet_index.frame
+        columns = {idx: frame.iloc[:, idx] for idx in range(len(frame.columns))}
+        names = list(frame.columns)
+        matrix = self._get_partner_matrix(partners_list, sheet_index)
+        
+        for partner_idx, partner_info in enumerate(partners_list):
+            col_idx = sheet_index.pod_col_idx + partner_idx + 1
+            costs = pd.Series(matrix[:, partner_idx], index=frame.index)
+            
+            if col_idx < len(names):
+                names[col_idx] = partner_info['partner']
+                columns[col_idx] = columns[col_idx].astype(object).where(costs.isna(), costs)
+            else:
+                while len(names) < col_idx:
+                    names.append(f"Unnamed: {len(names)}")
+                    columns[len(names) - 1] = pd.Series(float('nan'), index=frame.index)
+                names.append(partner_info['partner'])
+                columns[col_idx] = costs
+        
+        data = pd.concat([columns[idx] for idx in range(len(names))], axis=1)
+        data.columns = self._deduplicate_columns(names)
+        return data
+    
+    def _get_partner_matrix(self, partners_list: List[Dict], sheet_index: ReportSheetIndex) -> np.ndarray:
+        # Partners share the template POD ids, so they stack into one POD x partner matrix
+        # and the template rows are gathered from it with a single take
+        matrix = np.full((len(sheet_index.pod_names) + 1, len(partners_list)), np.nan)
+        for partner_idx, partner_info in enumerate(partners_list):
+            matrix[:-1, partner_idx] = partner_info['costs']
+        return matrix[sheet_index.column_ids]
+    
+    def _deduplicate_columns(self, names: List[Any]) -> List[Any]:
+        seen = {}
+        result = []
+        for name in names:
+            count = seen.get(name, 0)
+            seen[name] = count + 1
+            result.append(name if count == 0 else f"{name}.{count}")
+        return result
+    
+    def generate_and_write_best_prices(self, report_file: str, area_config: Dict[str, Any],
+                                       template_index: Optional[TemplateIndex] = None) -> None:
+        if template_index is None:
+            template_index = build_template_index(report_file, area_config)
+        matrix_export = MatrixExport(report_file) if self.export_matrix else None
+        
+        for container_type, container_size in [('20ft', '20feet'), ('40ft', '40feet')]:
+            container_config = area_config[container_size]
+            report_sheet = container_config['report_sheet']
+            bestprices_sheet = container_config['bestprices_sheet']
+            
+            with self.metrics.stage('best_prices', file=os.path.basename(report_file), sheet=bestprices_sheet):
+                ranking = self.rank_report_sheet(report_file, report_sheet, area_config.get('top_k', 4))
+            self._write_bestprices_report(ranking.to_dict(), report_file, bestprices_sheet, 
+                                          template_index.bestprices_sheet(bestprices_sheet), ranking.top)
+            
+            if matrix_export is not None:
+                matrix_export.add(container_type, ranking)
+        
+        self._save_matrix(matrix_export)
+
+    def rank_report_sheet(self, report_file: str, report_sheet: str, top: int = 4) -> BestPricesRanking:
+        input_data = self._prepare_data_for_bestprices(report_file, report_sheet, 3, 2)
+        return self._rank_best_prices(input_data, top)
+    
+    def write_scenario_best_prices(self, rankings: Dict[str, BestPricesRanking], report_file: str, output_file: str,
+                                   area_config: Dict[str, Any], template_index: TemplateIndex) -> None:
+        # Only the best price sheets change, the patch writer copies every other part of the report as is
+        workbook = PatchWorkbook(report_file)
+        matrix_export = MatrixExport(output_file) if self.export_matrix else None
+        
+        for container_type, container_size in [('20ft', '20feet'), ('40ft', '40feet')]:
+            bestprices_sheet = area_config[container_size]['bestprices_sheet']
+            with self.metrics.stage('best_prices', file=os.path.basename(output_file), sheet=bestprices_sheet):
+                # Ranks the scenario no longer fills go back to their template values
+                self._fill_bestprices_sheet(workbook[bestprices_sheet], rankings[container_type].to_dict(),
+                                            template_index.bestprices_sheet(bestprices_sheet), restore_missing=True,
+                                            top=rankings[container_type].top)
+            
+            if matrix_export is not None:
+                matrix_export.add(container_type, rankings[container_type])
+        
+        self._save_workbook(workbook, output_file)
+        self._save_matrix(matrix_export)
 
     def _prepare_data_for_bestprices(self, file: str, sheet: str, 
                                    skip_rows: int, skip_cols: int) -> pd.DataFrame:
         return pd.read_excel(file, sheet_name=sheet, skiprows=skip_rows).iloc[:, skip_cols:]
 
+    def _get_cost_matrix(self, data: pd.DataFrame, partner_positions: List[int]) -> np.ndarray:
+        matrix = np.full((len(data), len(partner_positions)), np.nan)
+        
+        for col_idx, position in enumerate(partner_positions):
+            column = data.iloc[:, position]
+            if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+                matrix[:, col_idx] = column.to_numpy(dtype=float, na_value=np.nan)
+            else:
+                matrix[:, col_idx] = [
+                    value if isinstance(value, numbers.Real) and not isinstance(value, bool) else np.nan
+                    for value in column
+                ]
+        
+        return matrix
+
+    def _rank_best_prices(self, data: pd.DataFrame, top: int = 4) -> BestPricesRanking:
+        partner_positions = [position for position, col_name in enumerate(data.columns) 
+                             if col_name != 'POD' and col_name not in ['DESTINATION', 'Unnamed: 0']]
+        partner_cols = [data.columns[position] for position in partner_positions]
+        
+        matrix = self._get_cost_matrix(data, partner_positions)
+        return BestPricesRanking(list(data['POD']), partner_cols, matrix, top)
+
     def _get_best_prices(self, data: pd.DataFrame, top: int = 4) -> Dict[str, list]:
-        result = {}
-        pods = pd.Series(data['POD'])
-        
-        for idx in range(len(pods)):
-            vals = []
-            for col_name in data.columns:
-                if col_name != 'POD' and col_name not in ['DESTINATION', 'Unnamed: 0']:
-                    try:
-                        cost = data[col_name][idx]
-                        if not pd.isna(cost) and not math.isnan(cost):
-                            vals.append((col_name, cost))
-                    except (ValueError, TypeError):
-                        continue
-
-            sorted_vals = sorted(vals, key=lambda x: x[1])
-            sz = min(top, len(sorted_vals))
-            result[pods[idx].upper()] = sorted_vals[:sz]
-            
-        return result
+        return self._rank_best_prices(data, top).to_dict()
 
     def _write_bestprices_report(self, wdict: Dict[str, list], file: str, 
-                               sheet: str, skip: int) -> None:
-        df = pd.read_excel(file, sheet_name=sheet, skiprows=skip)
-        fwd_idx = df.columns.get_loc('DESTINATION')
-        
-        workbook = opxl.load_workbook(file)
-        worksheet = workbook[sheet]
+                               sheet: str, sheet_index: BestPricesSheetIndex, top: Optional[int] = None) -> None:
+        workbook = self._open_workbook(file)
+        self._fill_bestprices_sheet(workbook[sheet], wdict, sheet_index, top=top)
+        self._save_workbook(workbook, file)
+    
+    def _fill_bestprices_sheet(self, worksheet, wdict: Dict[str, list], sheet_index: BestPricesSheetIndex,
+                               restore_missing: bool = False, top: Optional[int] = None) -> None:
+        fwd_idx = sheet_index.destination_col_idx
+        ranks = {}
         
-        for row in range(1, len(df['DESTINATION'])+1):
-            dest = worksheet.cell(row=row+skip+1, column=fwd_idx+1).value
-            if dest in wdict and len(wdict[dest]) != 0:
-                partner_name = wdict[dest][0][0]
-                cost = round(float(wdict[dest][0][1]), 2)
-                worksheet.cell(row=row+skip+1, column=fwd_idx+3).value = partner_name
-                worksheet.cell(row=row+skip+1, column=fwd_idx+4).value = cost
-                del wdict[dest][0]
+        if top is not None and top > sheet_index.rows_per_destination:
+            logger.warning(f"{datetime.now()}: top_k {top} is larger than the {sheet_index.rows_per_destination} rows "
+                           f"per destination of '{sheet_index.sheet}', ranks past the last row are dropped")
         
-        workbook.save(file) 
\ No newline at end of file
+        for row, row_pos in enumerate(sheet_index.destination_rows):
+            dest = sheet_index.destinations[row]
+            if dest not in wdict:
+                continue
+            
+            rank = ranks.get(dest, 0)
+            ranks[dest] = rank + 1
+            if top is not None and rank >= top:
+                # Rows past top_k would keep the template's partners, they are left empty instead
+                worksheet.cell(row=row_pos, column=fwd_idx+3).value = None
+                worksheet.cell(row=row_pos, column=fwd_idx+4).value = None
+            elif rank < len(wdict[dest]):
+                partner_name, cost = wdict[dest][rank]
+                worksheet.cell(row=row_pos, column=fwd_idx+3).value = partner_name
+                worksheet.cell(row=row_pos, column=fwd_idx+4).value = round(float(cost), 2)
+            elif restore_missing:
+                for col_idx in [fwd_idx+2, fwd_idx+3]:
+                    value = sheet_index.frame.iat[row, col_idx] if col_idx < len(sheet_index.frame.columns) else None
+                    worksheet.cell(row=row_pos, column=col_idx+1).value = None if pd.isna(value) else value
\ No newline at end of file
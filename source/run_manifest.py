@@ -0,0 +1,133 @@
+import os
+import json
+import math
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+from template_index import TemplateIndex
+
+
+MANIFEST_VERSION = 2
+
+
+class RunManifest:
+
+    def __init__(self, report_file: str):
+        self.report_file = report_file
+        self.manifest_file = f"{report_file}.manifest.json"
+        self.template_file = None
+        self.input_sheet = None
+        self.report_stat = None
+        self.partners: List[Dict[str, Any]] = []
+
+    def _stat_report(self) -> Optional[List[int]]:
+        try:
+            stat = os.stat(self.report_file)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load(self) -> bool:
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if data.get('version') != MANIFEST_VERSION:
+            return False
+
+        self.template_file = data['template_file']
+        self.input_sheet = data['input_sheet']
+        self.report_stat = data['report_stat']
+        self.partners = data['partners']
+        return True
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.manifest_file)
+        except FileNotFoundError:
+            pass
+
+    def save(self) -> None:
+        data = {
+            'version': MANIFEST_VERSION,
+            'report_file': os.path.basename(self.report_file),
+            'template_file': self.template_file,
+            'input_sheet': self.input_sheet,
+            # Saved after the report, so a report written by a run without a manifest no longer matches
+            'report_stat': self._stat_report(),
+            'partners': self.partners
+        }
+
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+
+    def is_compatible(self, template_file: str, input_sheet: str, template_index: TemplateIndex,
+                      sheets: Dict[str, str]) -> bool:
+        if self.template_file != template_file or self.input_sheet != input_sheet:
+            return False
+        if self.report_stat is None or self.report_stat != self._stat_report():
+            return False
+
+        for partner in self.partners:
+            for container_type, sheet in sheets.items():
+                if len(partner['costs'][container_type]) != len(template_index.report_sheet(sheet).pods):
+                    return False
+        return True
+
+    def find_partner(self, input_file: str) -> Optional[int]:
+        for idx, partner in enumerate(self.partners):
+            if partner['file'] == input_file:
+                return idx
+        return None
+
+    def set_partner(self, idx: Optional[int], input_file: str, file_hash: str,
+                    partner_data: Dict[str, Any], template_index: TemplateIndex) -> int:
+        entry = {
+            'file': input_file,
+            'hash': file_hash,
+            'partner': partner_data['20ft']['partner'],
+            'columns': {},
+            'costs': {}
+        }
+
+        for container_type in ['20ft', '40ft']:
+            sheet_index = template_index.report_sheet(partner_data[container_type]['sheet'])
+            # Stored per template row, so manifests do not depend on how POD names are interned
+            row_costs = np.append(partner_data[container_type]['costs'], np.nan)[sheet_index.pod_ids]
+            entry['costs'][container_type] = [None if math.isnan(cost) else cost for cost in row_costs.tolist()]
+
+        if idx is None:
+            idx = len(self.partners)
+            self.partners.append(entry)
+        else:
+            self.partners[idx] = entry
+
+        for container_type in ['20ft', '40ft']:
+            sheet_index = template_index.report_sheet(partner_data[container_type]['sheet'])
+            entry['columns'][container_type] = sheet_index.pod_col_idx + 2 + idx
+
+        return idx
+
+    def get_partner_data(self, idx: int, template_index: TemplateIndex, sheets: Dict[str, str]) -> Dict[str, Any]:
+        entry = self.partners[idx]
+        partner_data = {}
+
+        for container_type, sheet in sheets.items():
+            sheet_index = template_index.report_sheet(sheet)
+            row_costs = np.array(entry['costs'][container_type], dtype=np.float64)
+            rows = sheet_index.pod_ids >= 0
+
+            costs = np.full(len(sheet_index.pod_names), np.nan)
+            costs[sheet_index.pod_ids[rows]] = row_costs[rows]
+
+            partner_data[container_type] = {
+                'partner': entry['partner'],
+                'costs': costs,
+                'sheet': sheet
+            }
+
+        return partner_data
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import uuid
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+class RunMetrics:
+
+    def __init__(self, metrics_file: Optional[str] = None, memory: bool = False, run_id: Optional[str] = None):
+        self.metrics_file = metrics_file
+        self.memory = memory
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._stack = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.metrics_file is not None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['_stack'] = []
+        return state
+
+    def record(self, event: str, **fields) -> None:
+        if not self.enabled:
+            return
+
+        entry = {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'run': self.run_id,
+            'pid': os.getpid(),
+            'event': event
+        }
+        entry.update(fields)
+
+        # One write per line so worker processes can append to the same file
+        with open(self.metrics_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        if not self.enabled:
+            yield
+            return
+
+        frame = self._enter_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            peak = self._exit_memory(frame)
+            if peak is not None:
+                fields['peak_mb'] = round(peak / (1024 * 1024), 3)
+            self.record('stage', stage=name, wall_s=round(wall_time, 6), **fields)
+
+    def _enter_memory(self) -> Optional[Dict[str, int]]:
+        if not self.memory:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], peak)
+
+        tracemalloc.reset_peak()
+        frame = {'base': current, 'peak': current}
+        self._stack.append(frame)
+        return frame
+
+    def _exit_memory(self, frame: Optional[Dict[str, int]]) -> Optional[int]:
+        if frame is None:
+            return None
+
+        _, peak = tracemalloc.get_traced_memory()
+        self._stack.pop()
+        peak = max(frame['peak'], peak)
+
+        # Nested stages reset the tracemalloc peak, so the parent keeps the highest peak seen
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], peak)
+        else:
+            tracemalloc.stop()
+
+        return peak - frame['base']
+
+
+def create_run_metrics(config: Dict[str, Any], log_file: str = 'quotation.log') -> RunMetrics:
+    metrics_config = config.get('metrics', {})
+    if not metrics_config.get('enabled', False):
+        return RunMetrics()
+
+    metrics_file = os.path.join(os.path.dirname(os.path.abspath(log_file)),
+                                metrics_config.get('file', 'quotation.metrics.jsonl'))
+    return RunMetrics(metrics_file, metrics_config.get('memory', False))
\ No newline at end of file
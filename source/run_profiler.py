@@ -0,0 +1,108 @@
+import os
+import io
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+class PhaseProfile:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        self.peak = 0
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_size = -1
+
+
+class RunProfiler:
+
+    def __init__(self, profile_path: Optional[str] = None):
+        self.profile_path = profile_path
+        self.phases: Dict[str, PhaseProfile] = {}
+        self._active = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.profile_path is not None
+
+    @contextmanager
+    def phase(self, name: str):
+        # Nested phases are profiled as part of the outer one
+        if not self.enabled or self._active is not None:
+            yield
+            return
+
+        phase = self.phases.setdefault(name, PhaseProfile(name))
+        self._active = phase
+        tracemalloc.start()
+        phase.profile.enable()
+        try:
+            yield
+        finally:
+            phase.profile.disable()
+            snapshot = tracemalloc.take_snapshot()
+            phase.peak = max(phase.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            phase.calls += 1
+            self._active = None
+
+            # Keep the allocations of the entry that held the most memory when it ended
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')
+            ])
+            size = sum(stat.size for stat in snapshot.statistics('filename'))
+            if size > phase.snapshot_size:
+                phase.snapshot, phase.snapshot_size = snapshot, size
+
+    def _write_report(self, phase: PhaseProfile, report_file: str) -> None:
+        stream = io.StringIO()
+        stats = pstats.Stats(phase.profile, stream=stream)
+        stream.write(f"Phase {phase.name}: {phase.calls} runs, peak traced memory {phase.peak / (1024 * 1024):.1f} MB\n\n")
+        stream.write(f"Top {TOP_FUNCTIONS} functions by cumulative time\n")
+        stats.strip_dirs().sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+        stream.write(f"Top {TOP_ALLOCATIONS} allocation sites still alive at the end of the phase\n\n")
+        if phase.snapshot is not None:
+            for stat in phase.snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                stream.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+
+        with open(report_file, 'w', encoding='utf-8') as file:
+            file.write(stream.getvalue())
+
+    def save(self) -> List[str]:
+        if not self.enabled or not self.phases:
+            return []
+
+        os.makedirs(self.profile_path, exist_ok=True)
+        prefix = os.path.join(self.profile_path, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        files = []
+
+        for name, phase in self.phases.items():
+            # .prof files are pstats dumps, readable by snakeviz, gprof2dot and pstats
+            profile_file = f"{prefix}_{name}.prof"
+            phase.profile.dump_stats(profile_file)
+            files.append(profile_file)
+
+            report_file = f"{prefix}_{name}.txt"
+            self._write_report(phase, report_file)
+            files.append(report_file)
+
+            if phase.snapshot is not None:
+                snapshot_file = f"{prefix}_{name}.tracemalloc"
+                phase.snapshot.dump(snapshot_file)
+                files.append(snapshot_file)
+
+        self.phases = {}
+        return files
\ No newline at end of file
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from http.client import HTTPConnection
+from urllib.parse import urlsplit, quote, unquote
+from typing import Dict, Any, List, Optional, Tuple
+
+# Only the standard library: the client runs anywhere a quotation service is reachable
+
+
+def _disposition_file_name(disposition: str) -> Optional[str]:
+    # filename* carries the UTF-8 name, filename is its ASCII fallback
+    match = re.search(r"filename\*=UTF-8''([^;\s]+)", disposition, re.IGNORECASE)
+    if match:
+        return os.path.basename(unquote(match.group(1)))
+    match = re.search(r'filename="([^"]*)"', disposition)
+    return os.path.basename(match.group(1)) if match else None
+
+
+class ServiceError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class QuotationClient:
+
+    def __init__(self, url: str = 'http://127.0.0.1:8080', timeout: float = 300):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body=None,
+                 headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+    def _request_json(self, method: str, path: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = None if data is None else json.dumps(data).encode('utf-8')
+        status, _, content = self._request(method, path, body, {'Content-Type': 'application/json'})
+        result = json.loads(content) if content else {}
+        if status >= 400:
+            raise ServiceError(status, result.get('error', ''))
+        return result
+
+    def health(self) -> Dict[str, Any]:
+        return self._request_json('GET', '/health')
+
+    def files(self) -> List[Dict[str, Any]]:
+        return self._request_json('GET', '/files')['files']
+
+    def upload(self, file_path: str, file_name: Optional[str] = None) -> Dict[str, Any]:
+        file_name = file_name or os.path.basename(file_path)
+        with open(file_path, 'rb') as file:
+            status, _, content = self._request('PUT', f"/files/{quote(file_name)}", file,
+                                               {'Content-Length': str(os.path.getsize(file_path))})
+        result = json.loads(content) if content else {}
+        if status >= 400:
+            raise ServiceError(status, result.get('error', ''))
+        return result
+
+    def delete(self, file_name: str) -> Dict[str, Any]:
+        return self._request_json('DELETE', f"/files/{quote(file_name)}")
+
+    def build(self, area: str, tag: Optional[str] = None) -> Dict[str, Any]:
+        data = {'area': area}
+        if tag:
+            data['tag'] = tag
+        return self._request_json('POST', '/jobs', data)
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        return self._request_json('GET', f"/jobs/{job_id}")
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        return self._request_json('GET', '/jobs')['jobs']
+
+    def wait(self, job_id: str, interval: float = 0.5, timeout: float = 600) -> Dict[str, Any]:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.job(job_id)
+            if job['status'] in ('done', 'failed'):
+                return job
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Job '{job_id}' is still {job['status']} after {timeout}s")
+            time.sleep(interval)
+
+    def _download(self, path: str, output_path: str) -> str:
+        status, headers, content = self._request('GET', path)
+        if status >= 400:
+            raise ServiceError(status, json.loads(content).get('error', '') if content else '')
+
+        if os.path.isdir(output_path):
+            disposition = {name.lower(): value for name, value in headers.items()}.get('content-disposition', '')
+            file_name = _disposition_file_name(disposition) or path.strip('/').replace('/', '_')
+            output_path = os.path.join(output_path, file_name)
+
+        with open(output_path, 'wb') as file:
+            file.write(content)
+        return output_path
+
+    def download_report(self, job_id: str, output_path: str = '.') -> str:
+        return self._download(f"/jobs/{job_id}/report", output_path)
+
+    def download_matrix(self, job_id: str, output_path: str = '.') -> str:
+        return self._download(f"/jobs/{job_id}/matrix", output_path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upload partner files to a quotation service, build an area and download the report")
+    parser.add_argument('files', nargs='*', help="Partner files to upload before the build")
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help="Service URL")
+    parser.add_argument('--area', choices=['area1', 'area2'], required=True, help="Area to build")
+    parser.add_argument('--tag', default=None, help="Name the report after this tag")
+    parser.add_argument('--output', default='.', help="Folder to download the report into")
+    parser.add_argument('--matrix', action='store_true', help="Also download the cost matrix")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    client = QuotationClient(args.url)
+    os.makedirs(args.output, exist_ok=True)
+
+    try:
+        for file_path in args.files:
+            client.upload(file_path)
+            print(f"Uploaded {file_path}")
+
+        job = client.build(args.area, args.tag)
+        print(f"Job {job['id']} {job['status']}")
+        job = client.wait(job['id'])
+        if job['status'] != 'done':
+            print(f"Job {job['id']} failed: {job.get('error')}")
+            sys.exit(1)
+
+        print(f"Downloaded {client.download_report(job['id'], args.output)}")
+        if args.matrix:
+            print(f"Downloaded {client.download_matrix(job['id'], args.output)}")
+    except (ServiceError, OSError, TimeoutError) as e:
+        print(f"Quotation service error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
+
+
+REPORT_SKIP_ROWS = 3
+BESTPRICES_SKIP_ROWS = 4
+
+
+class ReportSheetIndex:
+
+    def __init__(self, sheet: str, df: pd.DataFrame, skip: int):
+        self.sheet = sheet
+        self.skip = skip
+        self.header_row = skip + 1
+        self.frame = df
+
+        try:
+            self.pod_col_idx = df.columns.get_loc('POD')
+        except KeyError:
+            self.pod_col_idx = 0
+
+        self.pods = list(df['POD'])
+        self.pod_keys = df['POD'].str.upper()
+        # POD names interned once per template: partner costs are dense arrays aligned to pod_names,
+        # pod_ids gives the name of every row (-1 for rows without a POD)
+        pod_ids, pod_names = pd.factorize(self.pod_keys)
+        self.pod_ids = pod_ids.astype(np.int32)
+        self.pod_names = np.asarray(pod_names, dtype=object)
+        # Partner columns only fill the rows whose POD is written exactly as its upper case name
+        same_case = self.pod_keys.to_numpy(dtype=object) == df['POD'].to_numpy(dtype=object)
+        self.column_ids = np.where(same_case, self.pod_ids, -1).astype(np.int32)
+
+    def row_costs(self, costs: np.ndarray) -> np.ndarray:
+        # The trailing NaN is picked by the -1 ids of rows a partner column leaves empty
+        return np.append(costs, np.nan)[self.column_ids]
+
+
+class BestPricesSheetIndex:
+
+    def __init__(self, sheet: str, df: pd.DataFrame, skip: int):
+        self.sheet = sheet
+        self.skip = skip
+        self.header_row = skip + 1
+        self.frame = df
+        self.destination_col_idx = df.columns.get_loc('DESTINATION')
+        self.destinations = list(df['DESTINATION'])
+        self.destination_rows = [self.header_row + row for row in range(1, len(self.destinations) + 1)]
+        # Ranks are written one per row, a destination shows at most as many ranks as it has rows
+        counts = df['DESTINATION'].value_counts()
+        self.rows_per_destination = int(counts.max()) if len(counts) else 0
+
+
+class TemplateIndex:
+
+    def __init__(self, template_file: str, report_sheets: List[str],
+                 bestprices_sheets: Optional[List[str]] = None, engine: Optional[str] = None):
+        self.template_file = template_file
+        self.report_sheets: Dict[str, ReportSheetIndex] = {}
+        self.bestprices_sheets: Dict[str, BestPricesSheetIndex] = {}
+
+        with pd.ExcelFile(template_file, engine=engine) as excel:
+            for sheet in report_sheets:
+                df = excel.parse(sheet_name=sheet, skiprows=REPORT_SKIP_ROWS)
+                self.report_sheets[sheet] = ReportSheetIndex(sheet, df, REPORT_SKIP_ROWS)
+
+            for sheet in bestprices_sheets or []:
+                df = excel.parse(sheet_name=sheet, skiprows=BESTPRICES_SKIP_ROWS)
+                self.bestprices_sheets[sheet] = BestPricesSheetIndex(sheet, df, BESTPRICES_SKIP_ROWS)
+
+    def report_sheet(self, sheet: str) -> ReportSheetIndex:
+        return self.report_sheets[sheet]
+
+    def bestprices_sheet(self, sheet: str) -> BestPricesSheetIndex:
+        return self.bestprices_sheets[sheet]
+
+
+def build_template_index(template_file: str, area_config: Dict[str, Any]) -> TemplateIndex:
+    report_sheets = []
+    bestprices_sheets = []
+    for container_size in ['20feet', '40feet']:
+        report_sheets.append(area_config[container_size]['report_sheet'])
+        bestprices_sheets.append(area_config[container_size]['bestprices_sheet'])
+
+    return TemplateIndex(template_file, report_sheets, bestprices_sheets)
\ No newline at end of file
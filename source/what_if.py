@@ -0,0 +1,179 @@
+import os
+import re
+import time
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+from config_manager import ConfigManager
+from data_processor import get_excel_engine
+from matrix_export import BestPricesRanking, MatrixExport, load_matrix
+from report_generator import ReportGenerator
+from template_index import TemplateIndex
+from quotation_plan import AREAS, generate_report_filename
+from run_metrics import RunMetrics
+
+
+CONTAINER_TYPES = [('20ft', '20feet'), ('40ft', '40feet')]
+ADJUSTMENT_PATTERN = re.compile(r'^([+-]?\d+(?:\.\d+)?)(%?)$')
+
+
+def parse_adjustment(adjustment: str) -> Tuple[str, float, bool]:
+    # PARTNER=+5% scales the partner's costs, PARTNER=-20 shifts them by a fixed amount
+    partner, _, value = adjustment.rpartition('=')
+    match = ADJUSTMENT_PATTERN.match(value.strip())
+    if not partner.strip() or not match:
+        raise ValueError(f"Invalid adjustment '{adjustment}', expected PARTNER=+N, PARTNER=-N or PARTNER=+N%")
+    return partner.strip(), float(match.group(1)), bool(match.group(2))
+
+
+class Scenario:
+
+    def __init__(self, name: str = 'WHATIF', include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 adjustments: Optional[List[str]] = None):
+        self.name = name
+        self.include = [partner.upper() for partner in include or []]
+        self.exclude = [partner.upper() for partner in exclude or []]
+        self.adjustments = {}
+        for adjustment in adjustments or []:
+            partner, amount, percent = parse_adjustment(adjustment)
+            self.adjustments[partner.upper()] = (amount, percent)
+
+    def partners(self) -> set:
+        return set(self.include) | set(self.exclude) | set(self.adjustments)
+
+    def select(self, partners: List[str]) -> List[int]:
+        return [position for position, partner in enumerate(partners)
+                if (not self.include or partner.upper() in self.include) and partner.upper() not in self.exclude]
+
+    def adjust(self, partner: str, costs: np.ndarray) -> np.ndarray:
+        amount, percent = self.adjustments.get(partner.upper(), (0.0, False))
+        if percent:
+            return costs * (1 + amount / 100)
+        return costs + amount
+
+
+class WhatIf:
+
+    def __init__(self, config: Dict[str, Any], area: str, report_file: Optional[str] = None,
+                 report_tag: Optional[str] = None, metrics: Optional[RunMetrics] = None):
+        self.config = config
+        self.area = area
+        self.area_config = config['report'][area]
+        self.top = self.area_config.get('top_k', 4)
+        self.report_file = report_file or os.path.join(config['report']['output_path'],
+                                                       generate_report_filename(area, report_tag))
+        if not os.path.exists(self.report_file):
+            raise ValueError(f"Report '{self.report_file}' not found, run the quotation first")
+
+        self.metrics = metrics or RunMetrics()
+        self.report_generator = ReportGenerator(config, self.metrics)
+        self.base = self._load_base()
+
+        template_file = os.path.join(config['report']['template_path'], self.area_config['template_file'])
+        # The best price sheets are only read, calamine skips the slow openpyxl load of a styled template
+        with self.metrics.stage('template_index', area=area):
+            self.template_index = TemplateIndex(template_file, [], [self.area_config[container_size]['bestprices_sheet']
+                                                                    for _, container_size in CONTAINER_TYPES],
+                                                get_excel_engine())
+
+    def _load_base(self) -> Dict[str, Tuple[List[str], List[str], np.ndarray]]:
+        matrix_export = MatrixExport(self.report_file)
+        try:
+            # A matrix older than its report was left by an earlier run and no longer matches it
+            if os.path.getmtime(os.path.join(matrix_export.matrix_path, 'index.json')) < os.path.getmtime(self.report_file):
+                raise ValueError(f"Matrix of '{self.report_file}' is outdated")
+            matrices = {container_type: load_matrix(self.report_file, container_type)
+                        for container_type, _ in CONTAINER_TYPES}
+        except (OSError, KeyError, ValueError):
+            matrices = None
+
+        if matrices is None:
+            # Reports of runs without export_matrix are ranked from their sheets once, the matrix is kept for next time
+            for container_type, container_size in CONTAINER_TYPES:
+                with self.metrics.stage('best_prices', file=os.path.basename(self.report_file), container=container_type):
+                    matrix_export.add(container_type, self.report_generator.rank_report_sheet(
+                        self.report_file, self.area_config[container_size]['report_sheet'], self.top))
+            matrix_export.save()
+            matrices = {container_type: load_matrix(self.report_file, container_type)
+                        for container_type, _ in CONTAINER_TYPES}
+
+        return {
+            container_type: (matrix['pods'].tolist(), matrix['partners'].tolist(), np.asarray(matrix['costs']))
+            for container_type, matrix in matrices.items()
+        }
+
+    @property
+    def partners(self) -> List[str]:
+        partners = []
+        for _, base_partners, _ in self.base.values():
+            partners += [partner for partner in base_partners if partner not in partners]
+        return partners
+
+    def rank(self, scenario: Scenario) -> Dict[str, BestPricesRanking]:
+        known = {partner.upper() for partner in self.partners}
+        unknown = sorted(scenario.partners() - known)
+        if unknown:
+            raise ValueError(f"Unknown partners {', '.join(unknown)} in {self.area}, "
+                             f"the report has {', '.join(self.partners)}")
+
+        rankings = {}
+        for container_type, (pods, partners, costs) in self.base.items():
+            positions = scenario.select(partners)
+            selected = [partners[position] for position in positions]
+            matrix = costs[:, positions]
+            for column, partner in enumerate(selected):
+                matrix[:, column] = scenario.adjust(partner, matrix[:, column])
+            rankings[container_type] = BestPricesRanking(pods, selected, matrix, self.top)
+        return rankings
+
+    def scenario_file(self, scenario: Scenario) -> str:
+        stem, extension = os.path.splitext(self.report_file)
+        name = re.sub(r'[^\w-]+', '_', scenario.name).strip('_').upper() or 'WHATIF'
+        return f"{stem}_{name}{extension}"
+
+    def write(self, scenario: Scenario, output_file: Optional[str] = None) -> Tuple[str, Dict[str, BestPricesRanking]]:
+        output_file = output_file or self.scenario_file(scenario)
+        with self.metrics.stage('what_if', area=self.area, scenario=scenario.name):
+            rankings = self.rank(scenario)
+            self.report_generator.write_scenario_best_prices(rankings, self.report_file, output_file,
+                                                             self.area_config, self.template_index)
+        return output_file, rankings
+
+    def changed_best(self, rankings: Dict[str, BestPricesRanking]) -> int:
+        # PODs whose cheapest partner differs from the report
+        changed = 0
+        for container_type, (pods, partners, costs) in self.base.items():
+            base = BestPricesRanking(pods, partners, costs, 1)
+            ranking = rankings[container_type]
+            base_best = [partners[idx] if idx >= 0 else None for idx in base.rank_partner[:, 0].tolist()]
+            best = [ranking.partners[idx] if idx >= 0 else None for idx in ranking.rank_partner[:, 0].tolist()]
+            changed += sum(before != after for before, after in zip(base_best, best))
+        return changed
+
+
+def run_what_if(config_path: str, scenario: Scenario, areas: Optional[List[str]] = None,
+                report_tag: Optional[str] = None) -> int:
+    config, err = ConfigManager(config_path).load_config()
+    if err:
+        print(f"File configuration '{config_path}' cannot be loaded: {err}")
+        return 1
+
+    areas = areas or [area for area in AREAS if config['quotation'][area].get('process', False)]
+    failed = False
+    for area in areas:
+        start = time.perf_counter()
+        try:
+            what_if = WhatIf(config, area, report_tag=report_tag)
+            loaded = time.perf_counter()
+            output_file, rankings = what_if.write(scenario)
+        except ValueError as e:
+            print(f"{area}: {e}")
+            failed = True
+            continue
+
+        partners = sorted({partner for ranking in rankings.values() for partner in ranking.partners})
+        print(f"{area}: {output_file}")
+        print(f"  partners {', '.join(partners) or 'none'}, best partner changed for {what_if.changed_best(rankings)} PODs, "
+              f"loaded in {loaded - start:.2f}s, scenario in {time.perf_counter() - loaded:.2f}s")
+
+    return 1 if failed else 0
\ No newline at end of file
@@ -0,0 +1,432 @@
+import io
+import re
+import os
+import stat
+import codecs
+import shutil
+import zipfile
+import tempfile
+import posixpath
+import numbers
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+from typing import Dict, Any, List, Optional, Tuple, Iterator, BinaryIO
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+CELL_PATTERN = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.DOTALL)
+ATTR_PATTERN = re.compile(r'([\w:]+)="([^"]*)"')
+COL_PATTERN = re.compile(r'<col\b([^>]*?)/>')
+CELL_REF_PATTERN = re.compile(r'([A-Z]+)(\d+)')
+ROW_NUMBER_PATTERN = re.compile(r'\br="(\d+)"')
+
+# Worksheet parts are read and decoded this many bytes at a time
+SHEET_CHUNK_SIZE = 1 << 20
+
+UNSET = object()
+
+
+class SheetXmlReader:
+    """Reads a worksheet part in chunks: the head before <sheetData>, one <row> at a time, then the rest as is."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.stream.read(SHEET_CHUNK_SIZE)
+        self.eof = not data
+        # Drop the rows already handed out before the buffer grows
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def _find(self, token: str, start: int) -> int:
+        # start is relative to pos, so a refill that drops the consumed text does not move it
+        while True:
+            found = self.buffer.find(token, self.pos + start)
+            if found >= 0:
+                return found - self.pos
+            start = max(start, len(self.buffer) - self.pos - len(token) + 1)
+            if not self._fill():
+                raise ValueError(f"Worksheet XML ends before '{token}'")
+
+    def _ensure(self, size: int) -> None:
+        while len(self.buffer) - self.pos < size and self._fill():
+            pass
+
+    def read_head(self) -> Tuple[str, str]:
+        start = self._find('<sheetData', 0)
+        end = self._find('>', start)
+        head = self.buffer[self.pos:self.pos + start]
+        tag = self.buffer[self.pos + start:self.pos + end + 1]
+        self.pos += end + 1
+        return head, tag
+
+    def next_row(self) -> Optional[Tuple[str, int, str]]:
+        # Returns the text before the next row, its number and its XML; None once </sheetData> is next
+        start = self._find('<', 0)
+        self._ensure(start + len('</sheetData>'))
+        if self.buffer.startswith('</sheetData>', self.pos + start):
+            return None
+        if not self.buffer.startswith('<row', self.pos + start):
+            raise ValueError("Unexpected element in worksheet sheetData")
+
+        end = self._find('>', start)
+        if self.buffer[self.pos + end - 1] != '/':
+            end = self._find('</row>', end) + len('</row>') - 1
+        gap = self.buffer[self.pos:self.pos + start]
+        row_xml = self.buffer[self.pos + start:self.pos + end + 1]
+        self.pos += end + 1
+        return gap, int(ROW_NUMBER_PATTERN.search(row_xml).group(1)), row_xml
+
+    def remainder(self) -> Iterator[str]:
+        yield self.buffer[self.pos:]
+        self.buffer, self.pos = '', 0
+        while self._fill():
+            yield self.buffer
+            self.buffer = ''
+
+
+class PatchCell:
+
+    __slots__ = ('worksheet', 'row', 'column', '_value', '_style_id')
+
+    def __init__(self, worksheet: 'PatchWorksheet', row: int, column: int):
+        self.worksheet = worksheet
+        self.row = row
+        self.column = column
+        self._value = UNSET
+        self._style_id = None
+
+    @property
+    def value(self) -> Any:
+        return None if self._value is UNSET else self._value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self._value = value
+
+    @property
+    def is_modified(self) -> bool:
+        return self._value is not UNSET or self._style_id is not None
+
+    @property
+    def style_id(self) -> Optional[str]:
+        if self._style_id is not None:
+            return self._style_id
+        return self.worksheet.get_template_style(self.row, self.column)
+
+    @style_id.setter
+    def style_id(self, style_id: Optional[str]) -> None:
+        self._style_id = style_id
+
+
+class ColumnDimension:
+
+    def __init__(self):
+        self.width = None
+
+
+class ColumnDimensions(dict):
+
+    def __missing__(self, key: str) -> ColumnDimension:
+        dimension = ColumnDimension()
+        self[key] = dimension
+        return dimension
+
+
+class PatchWorksheet:
+
+    def __init__(self, workbook: 'PatchWorkbook', title: str, part_name: str):
+        self.workbook = workbook
+        self.title = title
+        self.part_name = part_name
+        self.cells: Dict[Tuple[int, int], PatchCell] = {}
+        self.column_dimensions = ColumnDimensions()
+        self._template_styles: Dict[int, Dict[int, str]] = {}
+
+    def cell(self, row: int, column: int) -> PatchCell:
+        key = (row, column)
+        if key not in self.cells:
+            self.cells[key] = PatchCell(self, row, column)
+        return self.cells[key]
+
+    def write_column(self, column: int, rows: List[int], values: List[Any]) -> None:
+        cells = self.cells
+        for row, value in zip(rows, values):
+            cell = cells.get((row, column))
+            if cell is None:
+                cell = cells[(row, column)] = PatchCell(self, row, column)
+            cell._value = value
+
+    def get_template_style(self, row: int, column: int) -> Optional[str]:
+        if row not in self._template_styles:
+            styles = {}
+            row_xml = self.workbook.read_row(self.part_name, row)
+            if row_xml:
+                for cell_attrs, _ in CELL_PATTERN.findall(row_xml):
+                    attrs = dict(ATTR_PATTERN.findall(cell_attrs))
+                    if 's' in attrs and 'r' in attrs:
+                        styles[self.workbook.column_of(attrs['r'])] = attrs['s']
+            self._template_styles[row] = styles
+        return self._template_styles[row].get(column)
+
+    def is_modified(self) -> bool:
+        return any(cell.is_modified for cell in self.cells.values()) or any(dim.width is not None for dim in self.column_dimensions.values())
+
+
+class PatchWorkbook:
+    """Writes cell values into a copy of an xlsx package, rewriting only the changed worksheet parts."""
+
+    def __init__(self, file: str):
+        self.file = file
+        self.sheets = self._read_sheet_parts()
+        self.worksheets: Dict[str, PatchWorksheet] = {}
+
+    def _read_sheet_parts(self) -> Dict[str, str]:
+        with zipfile.ZipFile(self.file) as archive:
+            workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+            rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+
+        targets = {}
+        for rel in rels.iter(f'{{{PACKAGE_REL_NS}}}Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = target
+
+        sheets = {}
+        for sheet in workbook.iter(f'{{{MAIN_NS}}}sheet'):
+            sheets[sheet.get('name')] = targets[sheet.get(f'{{{REL_NS}}}id')]
+        return sheets
+
+    def __getitem__(self, sheet: str) -> PatchWorksheet:
+        if sheet not in self.worksheets:
+            self.worksheets[sheet] = PatchWorksheet(self, sheet, self.sheets[sheet])
+        return self.worksheets[sheet]
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return list(self.sheets.keys())
+
+    def read_row(self, part_name: str, row: int) -> Optional[str]:
+        # Reads the part only up to the row, header rows are found without loading the sheet
+        with zipfile.ZipFile(self.file) as archive, archive.open(part_name) as part:
+            reader = SheetXmlReader(part)
+            if reader.read_head()[1].endswith('/>'):
+                return None
+            while True:
+                next_row = reader.next_row()
+                if next_row is None or next_row[1] > row:
+                    return None
+                if next_row[1] == row:
+                    return next_row[2]
+
+    def column_of(self, ref: str) -> int:
+        return column_index_from_string(CELL_REF_PATTERN.match(ref).group(1))
+
+    def save(self, file: str) -> None:
+        patched = {ws.part_name: ws for ws in self.worksheets.values() if ws.is_modified()}
+
+        fd, tmp_file = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(os.path.abspath(file)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(self.file) as source, \
+                 zipfile.ZipFile(tmp_file, 'w', zipfile.ZIP_DEFLATED) as target:
+                for info in source.infolist():
+                    if info.filename in patched:
+                        with source.open(info) as part, target.open(info, 'w') as stream:
+                            self._write_sheet(patched[info.filename], part, stream)
+                    elif info.filename == 'xl/workbook.xml' and patched:
+                        target.writestr(info, self._patch_workbook_xml(source.read(info.filename).decode('utf-8')))
+                    else:
+                        with source.open(info) as part, target.open(info, 'w') as stream:
+                            shutil.copyfileobj(part, stream)
+            # mkstemp creates the file as 0600, the report gets the mode a plain copy or new file would have
+            os.chmod(tmp_file, self._file_mode(file))
+            os.replace(tmp_file, file)
+        except Exception:
+            os.remove(tmp_file)
+            raise
+
+        self.file = file
+
+    def _file_mode(self, file: str) -> int:
+        try:
+            return stat.S_IMODE(os.stat(file).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def _patch_workbook_xml(self, xml: str) -> str:
+        # Cached formula results in patched sheets are stale, let Excel recalculate on open
+        calc_pr = re.search(r'<calcPr\b[^>]*?/>', xml)
+        if calc_pr:
+            if 'fullCalcOnLoad' in calc_pr.group(0):
+                return xml
+            patched = calc_pr.group(0)[:-2].rstrip() + ' fullCalcOnLoad="1"/>'
+            return xml[:calc_pr.start()] + patched + xml[calc_pr.end():]
+
+        anchor = xml.find('</definedNames>')
+        anchor = anchor + len('</definedNames>') if anchor >= 0 else xml.find('</sheets>') + len('</sheets>')
+        return xml[:anchor] + '<calcPr fullCalcOnLoad="1"/>' + xml[anchor:]
+
+    def _write_sheet(self, worksheet: PatchWorksheet, part: BinaryIO, stream: BinaryIO) -> None:
+        rows: Dict[int, Dict[int, PatchCell]] = {}
+        for (row, column), cell in worksheet.cells.items():
+            if cell.is_modified:
+                rows.setdefault(row, {})[column] = cell
+        pending = sorted(rows)
+
+        reader = SheetXmlReader(part)
+        head, data_tag = reader.read_head()
+        output = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        output.write(self._patch_head(head, worksheet, rows))
+
+        idx = 0
+        if data_tag.endswith('/>'):
+            output.write('<sheetData>')
+        else:
+            output.write(data_tag)
+            # Rows are patched as they stream past, once the last patched row is written the rest is copied as is
+            while idx < len(pending):
+                next_row = reader.next_row()
+                if next_row is None:
+                    break
+                gap, row, row_xml = next_row
+                output.write(gap)
+
+                while idx < len(pending) and pending[idx] < row:
+                    output.write(self._build_row(pending[idx], '', rows[pending[idx]]))
+                    idx += 1
+
+                if idx < len(pending) and pending[idx] == row:
+                    output.write(self._patch_row(row, row_xml, rows[row]))
+                    idx += 1
+                else:
+                    output.write(row_xml)
+
+        for new_row in pending[idx:]:
+            output.write(self._build_row(new_row, '', rows[new_row]))
+        if data_tag.endswith('/>'):
+            output.write('</sheetData>')
+
+        for text in reader.remainder():
+            output.write(text)
+        output.flush()
+        output.detach()
+
+    def _patch_head(self, head: str, worksheet: PatchWorksheet, rows: Dict[int, Dict[int, PatchCell]]) -> str:
+        dimension = re.search(r'<dimension ref="([^"]*)"\s*/>', head)
+        if dimension and rows:
+            refs = dimension.group(1).split(':')
+            first = CELL_REF_PATTERN.match(refs[0])
+            last = CELL_REF_PATTERN.match(refs[-1])
+            if first and last:
+                min_col = min(column_index_from_string(first.group(1)), min(min(cols) for cols in rows.values()))
+                min_row = min(int(first.group(2)), min(rows))
+                max_col = max(column_index_from_string(last.group(1)), max(max(cols) for cols in rows.values()))
+                max_row = max(int(last.group(2)), max(rows))
+                ref = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+                head = head[:dimension.start()] + f'<dimension ref="{ref}"/>' + head[dimension.end():]
+
+        widths = {column_index_from_string(letter): dim.width
+                  for letter, dim in worksheet.column_dimensions.items() if dim.width is not None}
+        if not widths:
+            return head
+
+        cols_match = re.search(r'<cols>(.*?)</cols>', head, re.DOTALL)
+        cols = [dict(ATTR_PATTERN.findall(attrs)) for attrs in COL_PATTERN.findall(cols_match.group(1))] if cols_match else []
+
+        for column, width in widths.items():
+            for idx, col in enumerate(cols):
+                col_min, col_max = int(col['min']), int(col['max'])
+                if col_min <= column <= col_max:
+                    split = []
+                    if col_min < column:
+                        split.append(dict(col, max=str(column - 1)))
+                    split.append(dict(col, min=str(column), max=str(column), width=str(width), customWidth='1'))
+                    if column < col_max:
+                        split.append(dict(col, min=str(column + 1)))
+                    cols[idx:idx + 1] = split
+                    break
+            else:
+                cols.append({'min': str(column), 'max': str(column), 'width': str(width), 'customWidth': '1'})
+
+        cols.sort(key=lambda col: int(col['min']))
+        cols_xml = '<cols>' + ''.join(
+            '<col ' + ' '.join(f'{name}={quoteattr(value)}' for name, value in col.items()) + '/>' for col in cols
+        ) + '</cols>'
+
+        if cols_match:
+            return head[:cols_match.start()] + cols_xml + head[cols_match.end():]
+        return head + cols_xml
+
+    def _patch_row(self, row: int, row_xml: str, cells: Dict[int, PatchCell]) -> str:
+        row_attrs = re.match(r'<row\b([^>]*?)/?>', row_xml).group(1)
+        row_attrs = re.sub(r'\s*\bspans="[^"]*"', '', row_attrs)
+        if row_xml.endswith('/>') and not row_xml.endswith('</row>'):
+            return self._build_row(row, row_attrs, cells, [])
+
+        inner = row_xml[row_xml.index('>') + 1:-len('</row>')]
+        existing = []
+        for match in CELL_PATTERN.finditer(inner):
+            attrs = dict(ATTR_PATTERN.findall(match.group(1)))
+            existing.append((self.column_of(attrs['r']), attrs, match.group(0)))
+
+        return self._build_row(row, row_attrs, cells, existing)
+
+    def _build_row(self, row: int, row_attrs: str, cells: Dict[int, PatchCell],
+                   existing: Optional[List[Tuple[int, Dict[str, str], str]]] = None) -> str:
+        if not row_attrs:
+            row_attrs = f' r="{row}"'
+
+        merged = {}
+        for column, attrs, cell_xml in existing or []:
+            merged[column] = cell_xml if column not in cells else self._build_cell(row, column, cells[column], attrs, cell_xml)
+        for column, cell in cells.items():
+            if column not in merged:
+                merged[column] = self._build_cell(row, column, cell, {}, None)
+
+        return f'<row{row_attrs}>' + ''.join(merged[column] for column in sorted(merged)) + '</row>'
+
+    def _build_cell(self, row: int, column: int, cell: PatchCell, attrs: Dict[str, str],
+                    cell_xml: Optional[str]) -> str:
+        ref = f"{get_column_letter(column)}{row}"
+        style_id = cell._style_id if cell._style_id is not None else attrs.get('s')
+        style = f' s="{style_id}"' if style_id is not None else ''
+
+        if cell._value is UNSET:
+            if cell_xml is None:
+                return f'<c r="{ref}"{style}/>'
+            start_tag = re.match(r'<c\b[^>]*?(?=/?>)', cell_xml).group(0)
+            patched_tag = re.sub(r'\s*\bs="[^"]*"', '', start_tag) + style
+            return patched_tag + cell_xml[len(start_tag):]
+
+        value = cell._value
+        if value is None:
+            return f'<c r="{ref}"{style}/>'
+        if isinstance(value, bool):
+            return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Integral):
+            return f'<c r="{ref}"{style}><v>{int(value)}</v></c>'
+        if isinstance(value, numbers.Real):
+            return f'<c r="{ref}"{style}><v>{repr(float(value))}</v></c>'
+
+        text = escape(str(value))
+        space = ' xml:space="preserve"' if text != text.strip() else ''
+        return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{text}</t></is></c>'
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+import yaml
+import openpyxl
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INPUTS = os.path.join(ROOT, 'sample', 'inputs')
+
+
+def _write_config(tmp_path) -> str:
+    with open(os.path.join(ROOT, 'config.yaml'), 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+
+    config['quotation']['input_path'] = str(tmp_path / 'inputs')
+    config['quotation']['area2']['process'] = False
+    config['report']['output_path'] = str(tmp_path / 'outputs')
+    config['report']['template_path'] = os.path.join(ROOT, 'templates')
+    config['report']['pipeline'] = False
+    config['metrics']['enabled'] = False
+    config['archive']['enabled'] = False
+
+    config_path = str(tmp_path / 'config.yaml')
+    with open(config_path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(config, file, allow_unicode=True)
+    return config_path
+
+
+def _run(config_path: str, *args: str) -> None:
+    subprocess.run([sys.executable, os.path.join(ROOT, 'source', 'app_quotation.py'), 'run',
+                    '--config', config_path, *args], cwd=ROOT, check=True, capture_output=True)
+
+
+def _report_partners(tmp_path, config_path: str) -> list:
+    with open(config_path, 'r', encoding='utf-8') as file:
+        sheet = yaml.safe_load(file)['report']['area1']['20feet']['report_sheet']
+
+    report_file = next(entry.path for entry in os.scandir(tmp_path / 'outputs') if entry.name.endswith('AREA_1.XLSX'))
+    worksheet = openpyxl.load_workbook(report_file)[sheet]
+    for row in worksheet.iter_rows(values_only=True):
+        values = [value for value in row if value is not None]
+        if 'POD' in values:
+            return values[values.index('POD') + 1:]
+    raise AssertionError("No header row in the report")
+
+
+def test_incremental_after_normal_run_with_a_new_partner(tmp_path):
+    # A normal run rewrites the report, so the manifest of the previous incremental run must not be reused
+    os.makedirs(tmp_path / 'inputs')
+    os.makedirs(tmp_path / 'outputs')
+    for input_file in ['BLIS1.xls', 'TMVINA1.XLS']:
+        shutil.copy(os.path.join(INPUTS, input_file), tmp_path / 'inputs')
+    config_path = _write_config(tmp_path)
+
+    _run(config_path, '--incremental')
+    assert _report_partners(tmp_path, config_path) == ['BLIS', 'TMVINA']
+
+    shutil.copy(os.path.join(INPUTS, 'BLIS1.xls'), tmp_path / 'inputs' / 'AAA1.xls')
+    _run(config_path)
+    assert _report_partners(tmp_path, config_path) == ['AAA', 'BLIS', 'TMVINA']
+
+    _run(config_path, '--incremental')
+    assert _report_partners(tmp_path, config_path) == ['AAA', 'BLIS', 'TMVINA']
+
+    manifest_file = next(entry.path for entry in os.scandir(tmp_path / 'outputs') if entry.name.endswith('.manifest.json'))
+    with open(manifest_file, 'r', encoding='utf-8') as file:
+        partners = json.load(file)['partners']
+    assert [(partner['file'], partner['columns']['20ft']) for partner in partners] == \
+        [('AAA1.xls', 4), ('BLIS1.xls', 5), ('TMVINA1.XLS', 6)]
\ No newline at end of file